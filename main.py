@@ -11,9 +11,10 @@ from datetime import datetime
 
 from dotenv import load_dotenv
 
+from src.config.logging_config import setup_logging
 from src.config.settings import get_settings, validate_env
 from src.graphs.inmobilia_graph import process_message, start_conversation
-from src.services.analytics_client import track_conversation
+from src.services.analytics_client import analytics_batcher
 
 # Cargar variables de entorno
 load_dotenv()
@@ -43,36 +44,38 @@ async def chat_loop():
     print(f"🤖 Asistente: {welcome_message}")
 
     # Registrar inicio de conversación
-    track_conversation(
+    analytics_batcher.enqueue(
         thread_id=thread_id,
         event_type="conversation_started",
         event_data={
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now(),
             "config": {k: v for k, v in config.items() if k != "context"},
         },
     )
 
     # Comenzar loop de conversación
+    loop = asyncio.get_running_loop()
     while True:
-        # Entrada del usuario
-        user_input = input("\n👤 Tú: ")
+        # Entrada del usuario (en un hilo para no bloquear las tareas de fondo)
+        user_input = await loop.run_in_executor(None, input, "\n👤 Tú: ")
 
         # Verificar comando de salida
         if user_input.lower() in ["salir", "exit", "quit"]:
             # Registrar fin de conversación
-            track_conversation(
+            analytics_batcher.enqueue(
                 thread_id=thread_id,
                 event_type="conversation_ended",
                 event_data={
                     "reason": "user_exit",
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": datetime.now(),
                 },
             )
+            await analytics_batcher.flush()
             print("\n¡Gracias por usar Inmobilia AI! Hasta pronto.")
             break
 
         # Registrar mensaje del usuario
-        track_conversation(
+        analytics_batcher.enqueue(
             thread_id=thread_id,
             event_type="user_message",
             event_data={"message": user_input},
@@ -93,7 +96,7 @@ async def chat_loop():
             print(f"\n🤖 Asistente [{current_agent}]: {agent_response}")
 
             # Registrar respuesta del agente
-            track_conversation(
+            analytics_batcher.enqueue(
                 thread_id=thread_id,
                 event_type="assistant_response",
                 event_data={
@@ -109,17 +112,32 @@ async def chat_loop():
         # Verificar si debemos terminar
         if result.get("should_end", False):
             # Registrar fin de conversación
-            track_conversation(
+            analytics_batcher.enqueue(
                 thread_id=thread_id,
                 event_type="conversation_ended",
                 event_data={
                     "reason": "completion",
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": datetime.now(),
                 },
             )
+            await analytics_batcher.flush()
             print("\n💬 Conversación finalizada. ¡Gracias por usar Inmobilia AI!")
             break
 
 
 if __name__ == "__main__":
-    asyncio.run(chat_loop())
+    # Los logs se escriben desde un hilo aparte para no bloquear el event loop
+    log_listener = setup_logging()
+
+    # Usar uvloop como event loop si está disponible (no existe en Windows)
+    try:
+        import uvloop
+    except ImportError:
+        run = asyncio.run
+    else:
+        run = uvloop.run
+
+    try:
+        run(chat_loop())
+    finally:
+        log_listener.stop()
@@ -0,0 +1,31 @@
+"""Compila con mypyc los módulos de extracción (ver `make compile`).
+
+`python -m mypyc` deduce un layout `src/` a partir de pyproject.toml y copia las
+extensiones a `src/src/...`; aquí el directorio de paquetes se fija a la raíz del
+repositorio para que cada `.so` quede junto a su `.py`.
+
+Uso:
+    python setup_mypyc.py build_ext --inplace
+"""
+
+from mypyc.build import mypycify
+from setuptools import setup
+
+# Módulos de Python puro en la ruta crítica; si no hay .so se usa el .py
+MYPYC_MODULES = [
+    "src/agents/collector_extraction.py",
+    "src/agents/preferences_extraction.py",
+]
+
+setup(
+    name="inmobilia-ai-compiled",
+    packages=[],
+    py_modules=[],
+    package_dir={"": "."},
+    # Los módulos importados se analizan para inferir tipos pero sus errores no se reportan
+    ext_modules=mypycify(
+        ["--follow-imports=silent", *MYPYC_MODULES],
+        opt_level="3",
+        group_name="inmobilia_extraction",
+    ),
+)
@@ -4,46 +4,86 @@ Este agente se encarga de obtener información esencial como nombre,
 teléfono, email y otros datos básicos del usuario de manera conversacional.
 """
 
-import re
-from typing import Any, Dict, List
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Literal, Optional, Tuple
 
-from langchain_openai import ChatOpenAI
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableConfig
 from langgraph.types import Command
 
-from src.models.lead_data import LeadData
-from src.models.validators import validate_phone_number, validate_email
+from src.agents.collector_extraction import extract_contact_data, is_question
+from src.agents.supervisor_agent import carries_lead_data
+from src.models.agent_state import lead_data_changes
+from src.services.llm_client import ainvoke_cached, cached_system_message, create_chat_model
+
+# Número máximo de combinaciones de datos del lead memorizadas por agente
+_LEAD_SUMMARY_MEMO_SIZE = 128
+
+# Datos personales del lead; si ya se recolectó alguno, las respuestas no se cachean
+_PERSONAL_FIELDS = ("nombre", "celular", "email", "numero_documento")
+
+SYSTEM_PROMPT = """
+Eres un agente especializado en recolectar información básica de clientes inmobiliarios en Perú.
+Tu objetivo es obtener datos esenciales del usuario de manera natural y conversacional.
+
+Datos prioritarios que debes obtener (si no los tiene ya):
+1. Nombre del cliente
+2. Número de celular o email para contacto
+
+Indicaciones importantes:
+- Sé amable y conversacional, evita sonar robótico o como un formulario.
+- Haz una pregunta a la vez, no bombardees al usuario con múltiples preguntas.
+- Si el usuario ya proporcionó algún dato, no vuelvas a solicitarlo.
+- Si el usuario se muestra reacio a compartir algún dato, no insistas y pasa al siguiente.
+- Prioriza obtener al menos un medio de contacto (celular o email).
+
+Analiza cuidadosamente los datos ya recolectados para evitar pedir información redundante.
+"""
+
+# Respuestas predefinidas cuando ya se tienen todos los datos prioritarios y el
+# mensaje no hace ninguna pregunta
+TEMPLATE_ACKS = [
+    "¡Gracias, {nombre}! Ya tengo tus datos de contacto.",
+    "Perfecto, {nombre}. Con estos datos un asesor podrá comunicarse contigo.",
+    "Muchas gracias, {nombre}. Ya registré tu información de contacto.",
+    "¡Genial, {nombre}! Tus datos quedaron registrados correctamente.",
+]
 
 
 class CollectorAgent:
     """Agente especializado en recolectar datos básicos del usuario."""
 
-    def __init__(self, model_name: str = "claude-3-5-sonnet-latest"):
-        """Inicializa el agente recolector."""
-        self.model = ChatOpenAI(model=model_name, temperature=0.3)
-        self.system_prompt = self._get_system_prompt()
-        self.chat_history = []
+    def __init__(
+        self,
+        model_name: str = "claude-3-5-sonnet-latest",
+        temperature: float = 0.3,
+        provider: Optional[Literal["anthropic", "openai"]] = None,
+    ):
+        """Inicializa el agente recolector.
 
-    @staticmethod
-    def _get_system_prompt() -> str:
-        """Obtiene el prompt del sistema para el agente recolector."""
-        return """
-        Eres un agente especializado en recolectar información básica de clientes inmobiliarios en Perú.
-        Tu objetivo es obtener datos esenciales del usuario de manera natural y conversacional.
-
-        Datos prioritarios que debes obtener (si no los tiene ya):
-        1. Nombre del cliente
-        2. Número de celular o email para contacto
-
-        Indicaciones importantes:
-        - Sé amable y conversacional, evita sonar robótico o como un formulario.
-        - Haz una pregunta a la vez, no bombardees al usuario con múltiples preguntas.
-        - Si el usuario ya proporcionó algún dato, no vuelvas a solicitarlo.
-        - Si el usuario se muestra reacio a compartir algún dato, no insistas y pasa al siguiente.
-        - Prioriza obtener al menos un medio de contacto (celular o email).
-        
-        Analiza cuidadosamente los datos ya recolectados para evitar pedir información redundante.
+        Args:
+            model_name: Nombre del modelo a utilizar
+            temperature: Temperatura para la generación de texto
+            provider: Proveedor del modelo; si se omite se deduce del nombre del modelo
         """
+        self.model_name = model_name
+        self.temperature = temperature
+        self.model = create_chat_model(model_name, temperature, provider)
+        # Plantilla construida una sola vez: el prompt estático va primero y sin cambios
+        # para que el proveedor reutilice su caché; el contexto dinámico va después
+        self._prompt_tmpl = ChatPromptTemplate.from_messages(
+            [
+                cached_system_message(SYSTEM_PROMPT, self.model),
+                (
+                    "system",
+                    "Datos ya recolectados: {collected}\nDatos faltantes prioritarios: {missing}",
+                ),
+                ("human", "{user}"),
+            ]
+        )
+        self._lead_summary_memo: OrderedDict[FrozenSet[Tuple[str, Any]], Tuple[str, str]] = (
+            OrderedDict()
+        )
 
     async def process_node(self, state: Dict[str, Any], config: RunnableConfig) -> Command:
         """Procesa el estado actual y genera una respuesta.
@@ -61,36 +101,36 @@ class CollectorAgent:
         current_message = state.get("current_message", "")
         lead_data = state.get("lead_data", {})
 
-        # Extraer nueva información del mensaje
-        extracted_data = self._extract_data(current_message)
-
-        # Actualizar datos
+        # Extraer nueva información del mensaje y completar solo los campos vacíos
         updated_data = lead_data.copy()
-        for key, value in extracted_data.items():
-            if value and (key not in updated_data or not updated_data[key]):
-                updated_data[key] = value
-
-        # Generar una respuesta conversacional
-        response = self._generate_response(current_message, updated_data)
-
-        # Actualizar historial de mensajes
-        messages = state.get("messages", []).copy()
-        messages.append({"role": "assistant", "content": response, "agent": "collector"})
+        updated_data.update(
+            {
+                key: value
+                for key, value in self._extract_data(current_message).items()
+                if value and not updated_data.get(key)
+            }
+        )
 
-        # Actualizar el objeto lead si existe
-        lead_obj = state.get("lead_obj")
-        if lead_obj:
-            lead_obj.update_from_dict(updated_data)
+        # Si ya están todos los datos prioritarios y el usuario no pregunta nada, no
+        # hace falta llamar al LLM. La plantilla se elige según el turno para que la
+        # respuesta sea determinística
+        if not self._get_missing_data(updated_data) and not is_question(current_message):
+            ack = TEMPLATE_ACKS[len(state.get("messages", [])) % len(TEMPLATE_ACKS)]
+            response = ack.format(nombre=updated_data["nombre"])
         else:
-            lead_obj = LeadData(**updated_data)
+            # Generar una respuesta conversacional
+            response = await self._generate_response(current_message, updated_data)
+
+        # Nuevo mensaje para el historial (el reducer del estado lo añade al final)
+        new_message = {"role": "assistant", "content": response, "agent": "collector"}
 
         # Crear comando para actualizar estado y volver al supervisor
         return Command(
             goto="supervisor",
             update={
-                "lead_data": updated_data,
-                "lead_obj": lead_obj,
-                "messages": messages,
+                # Solo los campos que cambiaron; el supervisor actualiza `lead_obj`
+                "lead_data": lead_data_changes(lead_data, updated_data),
+                "messages": [new_message],
                 "last_agent_response": response,
                 "last_agent": "collector"
             }
@@ -99,38 +139,9 @@ class CollectorAgent:
     @staticmethod
     def _extract_data(text: str) -> Dict[str, Any]:
         """Extrae datos personales del texto del usuario."""
-        extracted = {}
-
-        # Extraer nombre (palabras que empiezan con mayúscula, precedidas por "me llamo", "soy", "mi nombre es")
-        name_patterns = [
-            r"(?:me llamo|soy|mi nombre es)\s+([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+){0,3})",
-            r"(?:^|\s)([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+){0,3})(?:\s+me llamo|\s+es mi nombre)",
-        ]
-
-        for pattern in name_patterns:
-            match = re.search(pattern, text)
-            if match:
-                extracted["nombre"] = match.group(1).strip()
-                break
-
-        # Extraer email
-        email_match = re.search(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+", text)
-        if email_match:
-            email = email_match.group(0)
-            if validate_email(email):
-                extracted["email"] = email
-
-        # Extraer número de celular (formato peruano)
-        phone_pattern = r"(?:\+51|51|9)[0-9]{8,9}"
-        phone_match = re.search(phone_pattern, text.replace(" ", ""))
-        if phone_match:
-            phone = phone_match.group(0)
-            if validate_phone_number(phone):
-                extracted["celular"] = phone
-
-        return extracted
-
-    def _generate_response(self, user_message: str, lead_data: Dict[str, Any]) -> str:
+        return extract_contact_data(text)
+
+    async def _generate_response(self, user_message: str, lead_data: Dict[str, Any]) -> str:
         """Genera una respuesta basada en el mensaje del usuario y los datos del lead.
 
         Args:
@@ -140,20 +151,71 @@ class CollectorAgent:
         Returns:
             Respuesta generada
         """
-        # Analizar qué datos faltan
-        missing_data = self._get_missing_data(lead_data)
-
-        # Construir mensajes para el LLM
-        messages = [
-            {"role": "system", "content": self.system_prompt},
-            {"role": "system", "content": f"Datos ya recolectados: {self._format_lead_data(lead_data)}"},
-            {"role": "system", "content": f"Datos faltantes prioritarios: {', '.join(missing_data) if missing_data else 'Ninguno'}"},
-            {"role": "user", "content": user_message}
-        ]
-
-        # Generar respuesta
-        response = self.model.invoke(messages)
-        return response.content
+        # Analizar qué datos tenemos y cuáles faltan
+        collected_str, missing_str = self._summarize_lead_data(lead_data)
+
+        # Las respuestas del recolector repiten datos personales: si el mensaje trae
+        # datos o ya hay datos personales del lead, no se leen ni guardan en caché,
+        # para no entregar a un usuario la respuesta generada para otro
+        if carries_lead_data(user_message) or any(
+            lead_data.get(field) for field in _PERSONAL_FIELDS
+        ):
+            key_parts = None
+            semantic_text = None
+        else:
+            key_parts = (
+                self.model_name,
+                self.temperature,
+                SYSTEM_PROMPT,
+                collected_str,
+                missing_str,
+                user_message,
+            )
+            semantic_text = f"{collected_str}\n{user_message}"
+
+        # Generar respuesta, reutilizando una cacheada si es posible
+        return await ainvoke_cached(
+            self._prompt_tmpl | self.model,
+            {"collected": collected_str, "missing": missing_str, "user": user_message},
+            namespace="collector",
+            temperature=self.temperature,
+            key_parts=key_parts,
+            semantic_text=semantic_text,
+        )
+
+    def _summarize_lead_data(self, lead_data: Dict[str, Any]) -> Tuple[str, str]:
+        """Obtiene los datos recolectados y faltantes formateados para el prompt.
+
+        Los datos del lead cambian con poca frecuencia entre turnos, por lo que el
+        resultado se memoriza según el conjunto de valores presentes.
+
+        Args:
+            lead_data: Datos actuales del lead
+
+        Returns:
+            Tupla con los datos recolectados y los datos faltantes, ambos formateados
+        """
+        try:
+            memo_key = frozenset((k, v) for k, v in lead_data.items() if v is not None)
+            summary = self._lead_summary_memo.get(memo_key)
+        except TypeError:
+            # Valores no hashables: calcular sin memorizar
+            memo_key, summary = None, None
+
+        if summary is None:
+            missing_data = self._get_missing_data(lead_data)
+            summary = (
+                self._format_lead_data(lead_data),
+                ", ".join(missing_data) if missing_data else "Ninguno",
+            )
+            if memo_key is not None:
+                self._lead_summary_memo[memo_key] = summary
+                if len(self._lead_summary_memo) > _LEAD_SUMMARY_MEMO_SIZE:
+                    self._lead_summary_memo.popitem(last=False)
+        elif memo_key is not None:
+            self._lead_summary_memo.move_to_end(memo_key)
+
+        return summary
 
     @staticmethod
     def _get_missing_data(lead_data: Dict[str, Any]) -> List[str]:
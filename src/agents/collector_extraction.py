@@ -0,0 +1,93 @@
+"""Extracción de datos personales para el agente recolector.
+
+Módulo sin dependencias de LangChain para poder compilarlo con mypyc
+(`make compile`). Si la extensión compilada no existe, Python importa
+este archivo `.py` normalmente.
+"""
+
+import re
+from typing import Dict
+
+import regex
+
+from src.models.validators import validate_email, validate_phone_number
+
+# Patrones precompilados para la extracción de datos personales.
+# El nombre usa clases Unicode (\p{Lu}, \p{Ll}) para aceptar cualquier letra con tilde
+# o diéresis, y grupos atómicos para evitar el backtracking en mensajes largos.
+# Las frases que lo introducen no distinguen mayúsculas ("Soy Ana", "soy Ana"). Un
+# nombre en minúsculas solo se acepta tras "me llamo" o "mi nombre es" y se toma una
+# sola palabra: tras "soy" sería ambiguo ("soy de Lima", "soy ingeniero")
+_NAME = r"(?>\p{Lu}\p{Ll}+(?:\s+\p{Lu}\p{Ll}+){0,3})"
+_NAME_RE = regex.compile(
+    rf"""
+    \b(?i:me\ llamo|soy|mi\ nombre\ es)\s+(?P<pre>{_NAME})       # "me llamo Juan Pérez"
+    |
+    \b(?i:me\ llamo|mi\ nombre\ es)\s+(?P<lower>\p{{Ll}}{{2,}})\b  # "me llamo juan"
+    |
+    (?:^|\s)(?P<post>{_NAME})(?:\s+me\ llamo|\s+es\ mi\ nombre)  # "Juan Pérez es mi nombre"
+    """,
+    regex.VERBOSE,
+)
+_EMAIL_RE = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
+# Celular peruano: 9 dígitos que empiezan con 9, con prefijo opcional +51/51. Admite
+# espacios entre dígitos ("987 654 321") sin normalizar todo el mensaje; los
+# lookarounds descartan números más largos en lugar de aceptar parte de ellos
+_PHONE_RE = re.compile(r"(?<!\d)(?:(?:\+\s*)?51\s*)?9(?:\s*[0-9]){8}(?!\d)")
+_WHITESPACE_RE = re.compile(r"\s+")
+# Signos de interrogación o pronombres interrogativos con tilde ("qué", "cómo", ...)
+_QUESTION_RE = re.compile(
+    r"[?¿]|\b(?:qué|cómo|cuándo|dónde|cuánto|cuánta|cuántos|cuántas|cuál|cuáles|quién)\b",
+    re.IGNORECASE,
+)
+
+
+def is_question(text: str) -> bool:
+    """Indica si el mensaje contiene una pregunta que requiere respuesta.
+
+    Args:
+        text: Mensaje del usuario
+
+    Returns:
+        True si el mensaje tiene signos de interrogación o palabras interrogativas
+    """
+    return _QUESTION_RE.search(text) is not None
+
+
+def extract_contact_data(text: str) -> Dict[str, str]:
+    """Extrae nombre, email y celular del texto del usuario.
+
+    Args:
+        text: Mensaje del usuario
+
+    Returns:
+        Diccionario solo con los campos encontrados y válidos
+    """
+    extracted: Dict[str, str] = {}
+
+    # Extraer nombre (precedido por "me llamo", "soy", "mi nombre es" o seguido de
+    # "es mi nombre"); los nombres escritos en minúsculas se capitalizan
+    name_match = _NAME_RE.search(text)
+    if name_match:
+        lower_name = name_match.group("lower")
+        extracted["nombre"] = (
+            lower_name.capitalize()
+            if lower_name
+            else (name_match.group("pre") or name_match.group("post")).strip()
+        )
+
+    # Extraer email
+    email_match = _EMAIL_RE.search(text)
+    if email_match:
+        email = email_match.group(0)
+        if validate_email(email):
+            extracted["email"] = email
+
+    # Extraer número de celular (formato peruano)
+    phone_match = _PHONE_RE.search(text)
+    if phone_match:
+        phone = _WHITESPACE_RE.sub("", phone_match.group(0))
+        if validate_phone_number(phone):
+            extracted["celular"] = phone
+
+    return extracted
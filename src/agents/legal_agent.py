@@ -4,14 +4,42 @@ Este agente se encarga de gestionar el consentimiento de datos personales
 de acuerdo con la Ley 29733 de Protección de Datos Personales de Perú.
 """
 
-from datetime import datetime
-from typing import Any, Dict, Tuple
+import re
+from datetime import datetime, timezone
+from functools import cached_property
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
 
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableConfig
 from langgraph.types import Command
 
+from src.models.agent_state import lead_data_changes
+from src.services.conversation_memory import format_history, is_first_turn
+from src.services.llm_cache import normalize_message
+from src.services.llm_client import ainvoke_cached, cached_system_message, create_chat_model
+
+# Expresiones de consentimiento como palabras completas ("casi" no cuenta como "si").
+# Un "sí" seguido de "no" ("si no quiero") no se considera consentimiento
+_CONSENT_WORDS = r"(?:s[ií](?!\s+no\b)|acepto|autorizo|de acuerdo|ok|claro)"
+_CONSENT_RE = re.compile(rf"\b{_CONSENT_WORDS}\b", re.IGNORECASE)
+# Negación hasta dos palabras antes de la expresión ("no acepto", "no lo autorizo",
+# "no estoy de acuerdo"); en ese caso el mensaje rechaza el consentimiento
+_NEGATED_CONSENT_RE = re.compile(
+    rf"\b(?:no|nunca|jam[aá]s|tampoco)(?:\s+\w+){{0,2}}?\s+{_CONSENT_WORDS}\b", re.IGNORECASE
+)
+# Mensajes que solo expresan consentimiento ("Sí, acepto!"); se responden sin LLM
+_CONSENT_ONLY_RE = re.compile(
+    rf"[\W_]*{_CONSENT_WORDS}(?:[\W_]+{_CONSENT_WORDS})*[\W_]*", re.IGNORECASE
+)
+
+# Respuesta predefinida cuando el mensaje solo otorga el consentimiento
+CONSENT_ACK = (
+    "¡Perfecto, gracias por tu autorización! Ahora cuéntame, ¿qué tipo de propiedad estás buscando?"
+)
+
+# Los mensajes con hasta esta cantidad de palabras se responden con el modelo rápido
+_FAST_MODEL_MAX_WORDS = 40
+
 LEGAL_PROMPT = """
 Eres un agente especializado en aspectos legales para un asistente inmobiliario en Perú.
 Tu principal responsabilidad es asegurar el cumplimiento de la Ley 29733 de Protección de Datos Personales.
@@ -27,31 +55,63 @@ Importante:
 - El tono debe ser profesional pero accesible y respetuoso.
 - Las respuestas deben ser breves y naturales, sin tecnicismos excesivos.
 
+Recuerda: si el usuario no ha dado consentimiento, debes solicitarlo antes de continuar.
+"""
+
+# Contexto dinámico; va después del prompt estático para no invalidar su caché
+LEGAL_CONTEXT_PROMPT = """
 Historial de la conversación:
 {chat_history}
+"""
 
-Mensaje del usuario: {input}
 
-Recuerda: si el usuario no ha dado consentimiento, debes solicitarlo antes de continuar.
-"""
+def grants_consent(text: str) -> bool:
+    """Indica si el mensaje otorga el consentimiento para tratar datos personales.
+
+    Args:
+        text: Mensaje del usuario
+
+    Returns:
+        True si contiene una expresión de consentimiento que no está negada
+    """
+    return bool(_CONSENT_RE.search(text)) and not _NEGATED_CONSENT_RE.search(text)
 
 
 class LegalAgent:
     """Agente especializado en aspectos legales y cumplimiento normativo."""
 
-    def __init__(self, model_name: str = "claude-3-5-sonnet-latest", temperature: float = 0.2):
+    def __init__(
+        self,
+        model_name: str = "claude-3-5-sonnet-latest",
+        temperature: float = 0.2,
+        fast_model_name: Optional[str] = None,
+    ):
         """Inicializa el agente legal.
 
         Args:
             model_name: Nombre del modelo de Claude a utilizar
             temperature: Temperatura para la generación de texto
+            fast_model_name: Modelo más económico para mensajes cortos; si se omite
+                se usa siempre `model_name`
         """
-        self.model = ChatOpenAI(model=model_name, temperature=temperature)
+        self.model_name = model_name
+        self.fast_model_name = fast_model_name or model_name
+        self.temperature = temperature
+        self.model = create_chat_model(model_name, temperature)
+        self.fast_model = (
+            create_chat_model(self.fast_model_name, temperature)
+            if self.fast_model_name != model_name
+            else self.model
+        )
         self.prompt = ChatPromptTemplate.from_messages(
-            [("system", LEGAL_PROMPT), ("human", "{input}")]
+            [
+                cached_system_message(LEGAL_PROMPT, self.model),
+                ("system", LEGAL_CONTEXT_PROMPT),
+                ("human", "{input}"),
+            ]
         )
-        self.chat_history = []
-        self.consent_obtained = False
+        # El agente no guarda estado de la conversación: la misma instancia atiende a
+        # todas las sesiones, así que el historial y el consentimiento vienen del estado
 
     async def process_node(self, state: Dict[str, Any], config: RunnableConfig) -> Command:
         """Procesa el estado actual y genera una respuesta.
@@ -69,99 +129,108 @@ class LegalAgent:
         current_message = state.get("current_message", "")
         lead_data = state.get("lead_data", {})
 
-        # Procesar el mensaje
-        response, updated_data = self.process_message(current_message, lead_data)
-
-        # Actualizar historial de mensajes
-        messages = state.get("messages", []).copy()
-        messages.append({"role": "assistant", "content": response, "agent": "legal"})
-
-        # Verificar si el objeto lead_obj ya existe
-        lead_obj = state.get("lead_obj")
-        if lead_obj:
-            lead_obj.update_from_dict(updated_data)
-        else:
-            from src.models.lead_data import LeadData
+        # Procesar el mensaje con el historial de esta sesión
+        response, updated_data = await self.aprocess_message(
+            current_message, lead_data, state.get("messages", [])
+        )
 
-            lead_obj = LeadData(**updated_data)
+        # Nuevo mensaje para el historial (el reducer del estado lo añade al final)
+        new_message = {"role": "assistant", "content": response, "agent": "legal"}
 
         # Crear comando para actualizar estado y volver al supervisor
         return Command(
             goto="supervisor",
             update={
-                "lead_data": updated_data,
-                "lead_obj": lead_obj,
-                "messages": messages,
+                # Solo los campos que cambiaron; el supervisor actualiza `lead_obj`
+                "lead_data": lead_data_changes(lead_data, updated_data),
+                "messages": [new_message],
                 "last_agent_response": response,
             },
         )
 
-    def process_message(
-        self, user_input: str, user_data: Dict[str, Any]
+    async def aprocess_message(
+        self,
+        user_input: str,
+        user_data: Dict[str, Any],
+        history: Sequence[Dict[str, Any]] = (),
     ) -> Tuple[str, Dict[str, Any]]:
         """Procesa el mensaje del usuario y genera una respuesta.
 
         Args:
             user_input: Mensaje del usuario
             user_data: Datos del usuario recolectados hasta el momento
+            history: Mensajes de la sesión, incluido el mensaje actual del usuario
 
         Returns:
             Tuple con la respuesta y los datos actualizados del usuario
         """
-        # Actualizar historial con el mensaje del usuario
-        self.chat_history.append({"role": "user", "content": user_input})
+        # El consentimiento es de la sesión: solo cuenta el registrado en sus datos
+        consent_obtained = user_data.get("consentimiento") is True
 
-        # Verificar si ya tenemos consentimiento
-        if user_data.get("consentimiento") is True:
-            self.consent_obtained = True
-
-        # Generar respuesta
-        response = self.model.invoke(
-            self.prompt.format(input=user_input, chat_history=self._format_history())
-        )
-
-        # Actualizar historial con la respuesta
-        self.chat_history.append({"role": "assistant", "content": response.content})
-
-        # Analizar si la respuesta del usuario indica consentimiento
-        if not self.consent_obtained:
-            consent_words = ["si", "sí", "acepto", "autorizo", "de acuerdo", "ok", "claro"]
-            if any(word in user_input.lower() for word in consent_words):
-                self.consent_obtained = True
-                user_data["consentimiento"] = True
-                user_data["fecha_consentimiento"] = datetime.now().isoformat()
-
-        return response.content, user_data
-
-    def _format_history(self) -> str:
-        """Formatea el historial de conversación para incluirlo en el prompt."""
-        if not self.chat_history:
-            return ""
-
-        formatted_history = ""
-        for msg in self.chat_history[-6:]:  # Limitamos a los últimos 6 mensajes
-            role = "Usuario" if msg["role"] == "user" else "Asistente"
-            formatted_history += f"{role}: {msg['content']}\n\n"
-
-        return formatted_history
+        # Un mensaje que solo otorga el consentimiento no necesita al LLM
+        if not consent_obtained and _CONSENT_ONLY_RE.fullmatch(user_input):
+            response_content = CONSENT_ACK
+        else:
+            # Los mensajes cortos se responden con el modelo rápido
+            if len(user_input.split()) <= _FAST_MODEL_MAX_WORDS:
+                model, model_name = self.fast_model, self.fast_model_name
+            else:
+                model, model_name = self.model, self.model_name
+
+            # Generar respuesta, reutilizando una cacheada si es posible. Un "sí" u
+            # "ok" significa algo distinto según la conversación, así que la clave
+            # incluye el historial y la caché semántica se limita al primer turno
+            normalized_input = normalize_message(user_input)
+            chat_history = format_history(history)
+            response_content = await ainvoke_cached(
+                model,
+                self.prompt.format_messages(input=user_input, chat_history=chat_history),
+                namespace="legal",
+                temperature=self.temperature,
+                key_parts=(
+                    model_name,
+                    self.temperature,
+                    LEGAL_PROMPT,
+                    chat_history,
+                    normalized_input,
+                ),
+                semantic_text=normalized_input if is_first_turn(history) else None,
+            )
+
+        # Analizar si la respuesta del usuario indica consentimiento. Se devuelve un
+        # dict nuevo para no modificar los datos de la sesión recibidos del estado
+        if not consent_obtained and grants_consent(user_input):
+            user_data = {
+                **user_data,
+                "consentimiento": True,
+                "fecha_consentimiento": datetime.now(timezone.utc).isoformat(),
+            }
+
+        return response_content, user_data
 
     def reset(self) -> None:
-        """Reinicia el estado del agente."""
-        self.chat_history = []
-        self.consent_obtained = False
+        """Reinicia el estado del agente.
+
+        El agente ya no guarda estado por conversación; se conserva por compatibilidad.
+        """
 
     # Métodos adicionales para integración con herramientas (alineado con LangGraph)
 
-    def get_tools(self):
-        """Retorna las herramientas que este agente puede utilizar."""
+    @cached_property
+    def tools(self) -> Tuple[Callable[..., Any], ...]:
+        """Herramientas del agente, construidas una sola vez (son sin estado)."""
         from src.agents.validators import ValidationTools
 
         validators = ValidationTools()
 
-        return [
+        return (
             validators.check_consent,
             validators.validate_consent,
-        ]
+        )
+
+    def get_tools(self):
+        """Retorna las herramientas que este agente puede utilizar."""
+        return self.tools
 
     def get_prompt(self):
         """Retorna el prompt base para este agente."""
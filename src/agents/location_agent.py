@@ -4,23 +4,102 @@ Este agente maneja consultas relacionadas con distritos, zonas,
 y ubicaciones específicas en Perú, con enfoque en Lima Metropolitana.
 """
 
-from typing import Any, Dict, Optional, Tuple, TypedDict
+import re
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Sequence, Tuple, TypedDict
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableConfig
-from langchain_openai import ChatOpenAI  # Cambiado de ChatAnthropic
 from langgraph.types import Command
 
-from src.models.lead_data import LeadData
+from src.models.agent_state import lead_data_changes
+from src.services.conversation_memory import format_history, is_first_turn
+from src.services.llm_cache import normalize_message
+from src.services.llm_client import ainvoke_cached, cached_system_message, create_chat_model
 
 
-class LocationInfo(TypedDict):
+class LocationInfo(TypedDict, total=False):
     """Información de ubicación extraída del mensaje."""
-    distrito: Optional[str]
-    zona: Optional[str]
-
-
-LOCATION_PROMPT = """
+    distrito: str
+    zona: str
+
+
+# Distritos reconocidos en la extracción, compartidos por todas las instancias
+DISTRITOS: Tuple[str, ...] = (
+    "Miraflores", "San Isidro", "Barranco", "San Borja", "Surco", "La Molina",
+    "Jesús María", "Lince", "Pueblo Libre", "Magdalena", "San Miguel",
+    "Los Olivos", "Independencia", "San Martín de Porres",
+    "Villa El Salvador", "San Juan de Miraflores", "Villa María del Triunfo",
+    "Ate", "Santa Anita", "Chorrillos", "Breña", "Rímac", "Cercado de Lima",
+    "La Victoria", "San Juan de Lurigancho", "Comas", "Carabayllo",
+    "San Luis", "El Agustino", "Santa Rosa", "Ancón", "Puente Piedra",
+    "Lurigancho", "Pachacámac", "San Bartolo", "Punta Hermosa",
+    "Punta Negra", "Santa María del Mar", "Pucusana", "Lurín", "Cieneguilla",
+)
+
+# Zonas de Lima y sus distritos principales
+ZONAS: Mapping[str, Tuple[str, ...]] = MappingProxyType(
+    {
+        "lima moderna": (
+            "Miraflores", "San Isidro", "Barranco", "San Borja", "Surco", "La Molina",
+        ),
+        "lima centro": ("Jesús María", "Lince", "Pueblo Libre", "Magdalena", "San Miguel"),
+        "lima norte": (
+            "Los Olivos", "Independencia", "San Martín de Porres", "Comas", "Carabayllo",
+        ),
+        "lima sur": (
+            "Villa El Salvador", "San Juan de Miraflores", "Villa María del Triunfo", "Chorrillos",
+        ),
+        "lima este": ("Ate", "Santa Anita", "La Molina", "San Juan de Lurigancho"),
+    }
+)
+
+
+# Tabla precalculada para quitar tildes en una sola pasada con str.translate
+_DEACCENT = str.maketrans("áéíóúüñ", "aeiouun")
+
+
+def _normalize(text: str) -> str:
+    """Quita tildes y pasa a minúsculas para comparar nombres de ubicaciones."""
+    return text.lower().translate(_DEACCENT)
+
+
+# Autómata de extracción: una sola alternación sobre los nombres normalizados
+# (sin tildes, en minúsculas), con los más largos primero para que
+# "San Juan de Miraflores" gane a "Miraflores". Los límites de palabra evitan
+# falsos positivos como "Ate" dentro de "patente"
+_CANONICAL_LOCATIONS: Mapping[str, Tuple[str, str]] = MappingProxyType(
+    {
+        **{_normalize(distrito): ("distrito", distrito) for distrito in DISTRITOS},
+        **{_normalize(zona): ("zona", zona) for zona in ZONAS},
+    }
+)
+_LOCATION_RE = re.compile(
+    r"\b(?:"
+    + "|".join(map(re.escape, sorted(_CANONICAL_LOCATIONS, key=len, reverse=True)))
+    + r")\b"
+)
+
+
+def extract_location(text: str) -> LocationInfo:
+    """Extrae el distrito y la zona mencionados en el texto del usuario.
+
+    Recorre el texto normalizado una sola vez con el autómata de ubicaciones,
+    sin llamar al modelo. Se queda con el primer distrito y la primera zona encontrados.
+    """
+    location_info: LocationInfo = {}
+    for match in _LOCATION_RE.finditer(_normalize(text)):
+        kind, canonical = _CANONICAL_LOCATIONS[match.group(0)]
+        location_info.setdefault(kind, canonical)
+        if len(location_info) == 2:
+            break
+
+    return location_info
+
+
+# El prompt se divide en instrucciones, base de conocimiento de distritos y cierre.
+# Instrucciones y distritos forman el bloque inmutable que el proveedor cachea
+_LOCATION_CORE = """
 Eres un agente especializado en ubicaciones inmobiliarias en Perú, con énfasis en Lima Metropolitana.
 Tu objetivo es ayudar al usuario a identificar zonas o distritos que se ajusten a sus necesidades.
 
@@ -36,22 +115,29 @@ Cuando interactúes con el usuario:
 - Ofrece información relevante sobre las zonas mencionadas (brevemente)
 - Evita incluir datos precisos de precios, pero sí puedes mencionar si una zona es económica, media o exclusiva
 
-Los principales distritos de Lima son:
+"""
+
+_LOCATION_KB = """Los principales distritos de Lima son:
 - Lima Moderna: Miraflores, San Isidro, Barranco, San Borja, Surco, La Molina (zonas exclusivas y de alto valor)
 - Lima Centro: Jesús María, Lince, Pueblo Libre, Magdalena, San Miguel (zonas de valor medio-alto)
 - Lima Norte: Los Olivos, Independencia, San Martín de Porres (zonas de valor medio-bajo)
 - Lima Sur: Villa El Salvador, San Juan de Miraflores, Villa María del Triunfo (zonas de valor medio-bajo)
 - Lima Este: Ate, Santa Anita, La Molina (zonas mixtas, desde exclusivas hasta económicas)
 
+"""
+
+_LOCATION_TAIL = """Responde de manera concisa y natural, enfocándote en ayudar al usuario a definir la ubicación ideal para su búsqueda inmobiliaria.
+"""
+
+LOCATION_PROMPT = _LOCATION_CORE + _LOCATION_KB + _LOCATION_TAIL
+
+# Contexto dinámico; va después del prompt estático para no invalidar su caché
+LOCATION_CONTEXT_PROMPT = """
 Historial de la conversación:
 {chat_history}
 
 Preferencias conocidas del usuario:
 {user_preferences}
-
-Mensaje del usuario: {input}
-
-Responde de manera concisa y natural, enfocándote en ayudar al usuario a definir la ubicación ideal para su búsqueda inmobiliaria.
 """
 
 
@@ -65,39 +151,18 @@ class LocationAgent:
             model_name: Nombre del modelo a utilizar
             temperature: Temperatura para la generación de texto
         """
-        self.model = ChatOpenAI(model=model_name, temperature=temperature)
+        self.model_name = model_name
+        self.temperature = temperature
+        self.model = create_chat_model(model_name, temperature)
         self.prompt = ChatPromptTemplate.from_messages(
-            [("system", LOCATION_PROMPT), ("human", "{input}")]
+            [
+                cached_system_message(_LOCATION_CORE + _LOCATION_KB, self.model, _LOCATION_TAIL),
+                ("system", LOCATION_CONTEXT_PROMPT),
+                ("human", "{input}"),
+            ]
         )
-        self.chat_history = []
-
-        # Definir distritos para uso en extracción estructurada
-        self.distritos = [
-            "Miraflores", "San Isidro", "Barranco", "San Borja", "Surco", "La Molina",
-            "Jesús María", "Lince", "Pueblo Libre", "Magdalena", "San Miguel",
-            "Los Olivos", "Independencia", "San Martín de Porres",
-            "Villa El Salvador", "San Juan de Miraflores", "Villa María del Triunfo",
-            "Ate", "Santa Anita", "Chorrillos", "Breña", "Rímac", "Cercado de Lima",
-            "La Victoria", "San Juan de Lurigancho", "Comas", "Carabayllo",
-            "San Luis", "El Agustino", "Santa Rosa", "Ancón", "Puente Piedra",
-            "Lurigancho", "Pachacámac", "San Bartolo", "Punta Hermosa",
-            "Punta Negra", "Santa María del Mar", "Pucusana", "Lurín", "Cieneguilla",
-        ]
-
-        # Definir zonas para uso en extracción estructurada
-        self.lima_zonas = {
-            "lima moderna": [
-                "Miraflores", "San Isidro", "Barranco", "San Borja", "Surco", "La Molina",
-            ],
-            "lima centro": ["Jesús María", "Lince", "Pueblo Libre", "Magdalena", "San Miguel"],
-            "lima norte": [
-                "Los Olivos", "Independencia", "San Martín de Porres", "Comas", "Carabayllo",
-            ],
-            "lima sur": [
-                "Villa El Salvador", "San Juan de Miraflores", "Villa María del Triunfo", "Chorrillos",
-            ],
-            "lima este": ["Ate", "Santa Anita", "La Molina", "San Juan de Lurigancho"],
-        }
+        # El agente no guarda estado de la conversación: la misma instancia atiende a
+        # todas las sesiones, así que el historial viene de los mensajes del estado
 
     async def process_node(self, state: Dict[str, Any], config: RunnableConfig) -> Command:
         """Procesa el estado actual y genera una respuesta.
@@ -115,122 +180,87 @@ class LocationAgent:
         current_message = state.get("current_message", "")
         lead_data = state.get("lead_data", {})
 
-        # Procesar el mensaje
-        response, updated_data = self.process_message(current_message, lead_data)
+        # Procesar el mensaje con el historial de esta sesión
+        response, updated_data = await self.aprocess_message(
+            current_message, lead_data, state.get("messages", [])
+        )
 
-        # Actualizar historial de mensajes
-        messages = state.get("messages", []).copy()
-        messages.append({"role": "assistant", "content": response, "agent": "location"})
+        # Nuevo mensaje para el historial (el reducer del estado lo añade al final)
+        new_message = {"role": "assistant", "content": response, "agent": "location"}
 
-        # Verificar si el objeto lead_obj ya existe
-        lead_obj = state.get("lead_obj")
-        if lead_obj:
-            lead_obj.update_from_dict(updated_data)
-        else:
-            lead_obj = LeadData(**updated_data)
 
         # Crear comando para actualizar estado y volver al supervisor
         return Command(
             goto="supervisor",
             update={
-                "lead_data": updated_data,
-                "lead_obj": lead_obj,
-                "messages": messages,
+                # Solo los campos que cambiaron; el supervisor actualiza `lead_obj`
+                "lead_data": lead_data_changes(lead_data, updated_data),
+                "messages": [new_message],
                 "last_agent_response": response,
             },
         )
 
-    def process_message(
-        self, user_input: str, user_data: Dict[str, Any]
+    async def aprocess_message(
+        self,
+        user_input: str,
+        user_data: Dict[str, Any],
+        history: Sequence[Dict[str, Any]] = (),
     ) -> Tuple[str, Dict[str, Any]]:
         """Procesa el mensaje del usuario y genera una respuesta.
 
         Args:
             user_input: Mensaje del usuario
             user_data: Datos del usuario recolectados hasta el momento
+            history: Mensajes de la sesión, incluido el mensaje actual del usuario
 
         Returns:
             Tuple con la respuesta y los datos actualizados del usuario
         """
-        # Actualizar historial con el mensaje del usuario
-        self.chat_history.append({"role": "user", "content": user_input})
+        chat_history = format_history(history)
 
-        # Extraer información sobre ubicación
+        # Extraer información sobre ubicación; se completa un dict nuevo para no
+        # modificar los datos del estado, que leen también los agentes en paralelo
         location_info = self._extract_location_structured(user_input)
-        for key, value in location_info.items():
-            if value and (key not in user_data or not user_data[key]):
-                user_data[key] = value
+        user_data = {
+            **user_data,
+            **{
+                key: value
+                for key, value in location_info.items()
+                if value and not user_data.get(key)
+            },
+        }
 
         # Formatear las preferencias del usuario para el prompt
         preferences_str = self._format_preferences(user_data)
 
-        # Generar respuesta
-        response = self.model.invoke(
-            self.prompt.format(
+        # Generar respuesta, reutilizando una cacheada si es posible. La clave incluye
+        # el historial y la caché semántica se limita al primer turno de la sesión
+        response_content = await ainvoke_cached(
+            self.model,
+            self.prompt.format_messages(
                 input=user_input,
-                chat_history=self._format_history(),
+                chat_history=chat_history,
                 user_preferences=preferences_str,
-            )
+            ),
+            namespace="location",
+            temperature=self.temperature,
+            key_parts=(
+                self.model_name,
+                self.temperature,
+                LOCATION_PROMPT,
+                preferences_str,
+                chat_history,
+                normalize_message(user_input),
+            ),
+            semantic_text=f"{preferences_str}\n{user_input}" if is_first_turn(history) else None,
         )
 
-        # Actualizar historial con la respuesta
-        self.chat_history.append({"role": "assistant", "content": response.content})
-
-        return response.content, user_data
-
-    def _extract_location_structured(self, text: str) -> Dict[str, Any]:
-        """Extrae información sobre ubicación del texto del usuario usando un enfoque estructurado."""
-        # Definir la estructura de salida esperada
-        structured_output_prompt = f"""
-        Analiza este texto y extrae información sobre ubicaciones en Lima, Perú.
-        
-        Texto: "{text}"
-        
-        Responde SOLO con un JSON que contenga estos campos:
-        - distrito: El distrito de Lima mencionado, o null si no se menciona
-        - zona: La zona de Lima mencionada (lima moderna, lima centro, lima norte, lima sur, lima este), o null si no se menciona
-        
-        Distritos válidos: {", ".join(self.distritos)}
-        Zonas válidas: {", ".join(self.lima_zonas.keys())}
-        """
-
-        try:
-            # Usar el modelo para extraer la información estructurada
-            extraction_response = self.model.with_structured_output(LocationInfo).invoke(
-                [{"role": "user", "content": structured_output_prompt}]
-            )
-
-            # Validar la extracción
-            location_info = {}
-            if extraction_response.get("distrito") and extraction_response["distrito"] in self.distritos:
-                location_info["distrito"] = extraction_response["distrito"]
-
-            if extraction_response.get("zona") and extraction_response["zona"] in self.lima_zonas.keys():
-                location_info["zona"] = extraction_response["zona"]
-
-            return location_info
-        except (ValueError, KeyError, AttributeError):
-            # Si hay un error, utilizar el método de extracción basado en reglas como fallback
-            return self._extract_location_fallback(text)
-
-    def _extract_location_fallback(self, text: str) -> Dict[str, Any]:
-        """Método de respaldo para extraer información sobre ubicación basado en reglas."""
-        location_info = {}
-        text_lower = text.lower()
+        return response_content, user_data
 
-        # Verificar si menciona algún distrito específico
-        for distrito in self.distritos:
-            if distrito.lower() in text_lower:
-                location_info["distrito"] = distrito
-                break
-
-        # Verificar si menciona alguna zona genérica
-        for zona in self.lima_zonas.keys():
-            if zona in text_lower:
-                location_info["zona"] = zona
-                break
-
-        return location_info
+    @staticmethod
+    def _extract_location_structured(text: str) -> LocationInfo:
+        """Extrae el distrito y la zona mencionados en el texto del usuario."""
+        return extract_location(text)
 
     def _format_preferences(self, data: Dict[str, Any]) -> str:
         """Formatea las preferencias del usuario para incluirlas en el prompt."""
@@ -265,27 +295,13 @@ class LocationAgent:
             return "No se conocen preferencias de ubicación del usuario todavía."
 
         # Formatear los datos
-        formatted = ""
-        for key in existing_keys:
-            formatted += f"- {key_mapping[key]}: {data[key]}\n"
-
-        return formatted
-
-    def _format_history(self) -> str:
-        """Formatea el historial de conversación para incluirlo en el prompt."""
-        if not self.chat_history:
-            return ""
-
-        formatted_history = ""
-        for msg in self.chat_history[-6:]:  # Limitamos a los últimos 6 mensajes
-            role = "Usuario" if msg["role"] == "user" else "Asistente"
-            formatted_history += f"{role}: {msg['content']}\n\n"
-
-        return formatted_history
+        return "".join(f"- {key_mapping[key]}: {data[key]}\n" for key in existing_keys)
 
     def reset(self) -> None:
-        """Reinicia el estado del agente."""
-        self.chat_history = []
+        """Reinicia el estado del agente.
+
+        El agente ya no guarda estado por conversación; se conserva por compatibilidad.
+        """
 
     def get_prompt(self) -> str:
         """Retorna el prompt base para este agente."""
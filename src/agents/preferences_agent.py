@@ -4,19 +4,33 @@ Este agente se enfoca en obtener detalles específicos sobre el tipo
 de inmueble que busca el usuario, sus características, presupuesto y otros requisitos.
 """
 
-from datetime import datetime
-from typing import Any, Dict, Optional, Tuple
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableConfig
-from langchain_openai import ChatOpenAI
 from langgraph.types import Command
 from pydantic import BaseModel, Field
 
+from src.agents.preferences_extraction import extract_preferences
+from src.models.agent_state import lead_data_changes
+from src.services.conversation_memory import format_history, is_first_turn
+from src.services.llm_cache import normalize_message
+from src.services.llm_client import (
+    ainvoke_cached,
+    cached_system_message,
+    create_chat_model,
+    provider_slot,
+)
+
+logger = logging.getLogger(__name__)
+
 
 # Modelos para estructurar la extracción
 class PropertyPreference(BaseModel):
-    """Modelo para estructurar las preferencias inmobiliarias extraídas."""
+    """Registra las preferencias inmobiliarias mencionadas explícitamente en el mensaje."""
 
     tipo_inmueble: Optional[str] = Field(None, description="Tipo de inmueble buscado (departamento, casa, etc.)")
     presupuesto_min: Optional[float] = Field(None, description="Presupuesto mínimo en la moneda mencionada")
@@ -31,6 +45,17 @@ class PropertyPreference(BaseModel):
         extra = "ignore"
 
 
+# Preferencias relevantes para el prompt, en orden, con su nombre legible
+_PREFERENCE_LABELS = (
+    ("tipo_inmueble", "Tipo de inmueble"),
+    ("presupuesto_min", "Presupuesto mínimo"),
+    ("presupuesto_max", "Presupuesto máximo"),
+    ("metraje", "Metraje aproximado"),
+    ("habitaciones", "Número de habitaciones"),
+    ("distrito", "Distrito de interés"),
+    ("timeline_compra", "Plazo para la compra"),
+)
+
 PREFERENCES_PROMPT = """
 Eres un agente especializado en capturar preferencias inmobiliarias en Perú.
 Tu objetivo es obtener detalles específicos sobre el tipo de propiedad que el usuario está buscando.
@@ -51,39 +76,18 @@ Indicaciones importantes:
 - Ayuda al usuario a definir sus preferencias si están ambiguas (ej. si dice "barato", pregunta por un rango específico).
 - Adapta las preguntas al contexto de Perú (moneda en soles, zonas peruanas, etc.).
 
+Responde de manera natural y pregunta por la siguiente preferencia prioritaria que falte.
+"""
+
+# Contexto dinámico; va después del prompt estático para no invalidar su caché
+PREFERENCES_CONTEXT_PROMPT = """
 Historial de la conversación:
 {chat_history}
 
 Preferencias ya conocidas:
 {known_preferences}
-
-Mensaje del usuario: {input}
-
-Responde de manera natural y pregunta por la siguiente preferencia prioritaria que falte.
 """
 
-# Prompt para extraer preferencias estructuradas
-EXTRACTION_PROMPT = """
-Extrae las preferencias inmobiliarias mencionadas en el mensaje del usuario y estructúralas 
-según el formato solicitado. Solo incluye lo explícitamente mencionado en este mensaje, 
-no información de mensajes anteriores.
-
-Mensaje del usuario: {text}
-
-Detecta las siguientes categorías si están presentes:
-- tipo_inmueble: El tipo de propiedad mencionado (departamento, casa, terreno, etc.)
-- presupuesto_min: El monto mínimo del presupuesto en números
-- presupuesto_max: El monto máximo del presupuesto en números
-- moneda: La moneda mencionada (soles, dólares, etc.)
-- metraje: El tamaño en metros cuadrados como número entero
-- habitaciones: La cantidad de habitaciones como número entero
-- distrito: El distrito o zona mencionada de Lima/Perú
-- timeline_compra: Plazo para comprar (inmediato, 1-3 meses, 3-6 meses, 6+ meses)
-
-Responde solo con los datos encontrados, omitiendo los campos no mencionados.
-"""
-
-
 class PreferencesAgent:
     """Agente especializado en capturar preferencias inmobiliarias."""
 
@@ -94,14 +98,21 @@ class PreferencesAgent:
             model_name: Nombre del modelo de Claude a utilizar
             temperature: Temperatura para la generación de texto
         """
-        self.model = ChatOpenAI(model=model_name, temperature=temperature)
+        self.model_name = model_name
+        self.temperature = temperature
+        self.model = create_chat_model(model_name, temperature)
         self.prompt = ChatPromptTemplate.from_messages(
-            [("system", PREFERENCES_PROMPT), ("human", "{input}")]
+            [
+                cached_system_message(PREFERENCES_PROMPT, self.model),
+                ("system", PREFERENCES_CONTEXT_PROMPT),
+                ("human", "{input}"),
+            ]
         )
-        self.extraction_prompt = ChatPromptTemplate.from_messages(
-            [("system", EXTRACTION_PROMPT), ("human", "{text}")]
-        )
-        self.chat_history = []
+        # Mismo modelo con la herramienta de extracción, para responder y extraer
+        # preferencias en una sola llamada
+        self.model_with_extraction = self.model.bind_tools([PropertyPreference])
+        # El agente no guarda estado de la conversación: la misma instancia atiende a
+        # todas las sesiones, así que el historial viene de los mensajes del estado
 
     async def process_node(self, state: Dict[str, Any], config: RunnableConfig) -> Command:
         """Procesa el estado actual y genera una respuesta.
@@ -119,154 +130,208 @@ class PreferencesAgent:
         current_message = state.get("current_message", "")
         lead_data = state.get("lead_data", {})
 
-        # Procesar el mensaje
-        response, updated_data = self.process_message(current_message, lead_data)
-
-        # Actualizar historial de mensajes
-        messages = state.get("messages", []).copy()
-        messages.append({"role": "assistant", "content": response, "agent": "preferences"})
+        # Procesar el mensaje con el historial de esta sesión
+        response, updated_data = await self.aprocess_message(
+            current_message, lead_data, state.get("messages", [])
+        )
 
-        # Verificar si el objeto lead_obj ya existe
-        lead_obj = state.get("lead_obj")
-        if lead_obj:
-            lead_obj.update_from_dict(updated_data)
-        else:
-            from src.models.lead_data import LeadData
+        # Nuevo mensaje para el historial (el reducer del estado lo añade al final)
+        new_message = {"role": "assistant", "content": response, "agent": "preferences"}
 
-            lead_obj = LeadData(**updated_data)
 
         # Crear comando para actualizar estado y volver al supervisor
         return Command(
             goto="supervisor",
             update={
-                "lead_data": updated_data,
-                "lead_obj": lead_obj,
-                "messages": messages,
+                # Solo los campos que cambiaron; el supervisor actualiza `lead_obj`
+                "lead_data": lead_data_changes(lead_data, updated_data),
+                "messages": [new_message],
                 "last_agent_response": response,
             },
         )
 
-    def process_message(
-        self, user_input: str, user_data: Dict[str, Any]
+    async def aprocess_message(
+        self,
+        user_input: str,
+        user_data: Dict[str, Any],
+        history: Sequence[Dict[str, Any]] = (),
     ) -> Tuple[str, Dict[str, Any]]:
         """Procesa el mensaje del usuario y genera una respuesta.
 
+        Los datos recibidos no se modifican: se retorna un diccionario nuevo, ya que
+        el mismo `lead_data` del estado lo leen los agentes que corren en paralelo.
+
         Args:
             user_input: Mensaje del usuario
             user_data: Datos del usuario recolectados hasta el momento
+            history: Mensajes de la sesión, incluido el mensaje actual del usuario
 
         Returns:
             Tuple con la respuesta y los datos actualizados del usuario
         """
-        # Actualizar historial con el mensaje del usuario
-        self.chat_history.append({"role": "user", "content": user_input})
+        chat_history = format_history(history)
+        first_turn = is_first_turn(history)
+
+        # Extraer preferencias localmente: montos, metraje y habitaciones se
+        # interpretan de forma determinista antes de consultar al modelo
+        extracted = extract_preferences(user_input)
+
+        # Datos del usuario con las nuevas preferencias, en un dict nuevo
+        user_data = {**user_data, **extracted}
+
+        # El modelo responde y registra las preferencias con la herramienta a la vez.
+        # El extractor local no cubre todos los campos (por ejemplo, el distrito o las
+        # cifras escritas en palabras), así que se combinan ambos resultados; si los
+        # dos traen el mismo campo, prevalece el valor del extractor local
+        response_content, preferences = await self._generate_response_with_extraction(
+            user_input, user_data, chat_history, first_turn
+        )
+        # Los campos son escalares: basta con recorrer los valores del modelo
+        for key, value in preferences.__dict__.items():
+            if value is not None and key not in extracted:
+                user_data[key] = value
+
+        # Actualizar la fecha de última interacción
+        user_data["ultima_interaccion"] = datetime.now(timezone.utc).isoformat()
+
+        return response_content, user_data
+
+    async def aprocess_batch(
+        self, turns: Sequence[Tuple[str, Dict[str, Any]]], max_concurrency: int = 8
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """Procesa en paralelo mensajes independientes, por ejemplo al reprocesar conversaciones.
+
+        El agente no guarda estado por conversación, así que los mensajes no se mezclan.
+        Todos comparten el prompt de sistema cacheado: solo las primeras llamadas pagan
+        la escritura de la caché del proveedor.
+
+        Args:
+            turns: Pares (mensaje del usuario, datos del usuario) a procesar
+            max_concurrency: Máximo de mensajes procesados a la vez
+
+        Returns:
+            Lista de tuplas (respuesta, datos actualizados) en el orden de `turns`
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
 
-        # Extraer preferencias del mensaje usando modelo estructurado
-        preferences = self._extract_structured_preferences(user_input)
+        async def process_turn(
+            user_input: str, user_data: Dict[str, Any]
+        ) -> Tuple[str, Dict[str, Any]]:
+            async with semaphore:
+                return await self.aprocess_message(user_input, user_data)
 
-        # Actualizar datos del usuario con nuevas preferencias
-        updated_data = user_data.copy()
-        for key, value in preferences.model_dump(exclude_none=True).items():
-            if value is not None:
-                updated_data[key] = value
+        return list(await asyncio.gather(*(process_turn(text, data) for text, data in turns)))
+
+    async def _generate_response(
+        self, user_input: str, user_data: Dict[str, Any], chat_history: str, first_turn: bool
+    ) -> str:
+        """Genera la respuesta conversacional para el mensaje del usuario.
+
+        Args:
+            user_input: Mensaje del usuario
+            user_data: Datos del usuario a considerar como preferencias conocidas
+            chat_history: Historial de la sesión formateado para el prompt
+            first_turn: Si el asistente aún no respondió en la sesión; solo entonces
+                se usa la caché semántica
 
+        Returns:
+            Respuesta generada
+        """
         # Formatear las preferencias conocidas para el prompt
-        preferences_str = self._format_preferences(updated_data)
+        preferences_str = self._format_preferences(user_data)
 
-        # Generar respuesta
-        response = self.model.invoke(
-            self.prompt.format(
+        # Generar respuesta, reutilizando una cacheada si es posible. La clave incluye
+        # el historial, que cambia el sentido de los mensajes breves ("sí", "ok")
+        return await ainvoke_cached(
+            self.model,
+            self.prompt.format_messages(
                 input=user_input,
-                chat_history=self._format_history(),
+                chat_history=chat_history,
                 known_preferences=preferences_str,
-            )
+            ),
+            namespace="preferences",
+            temperature=self.temperature,
+            key_parts=(
+                self.model_name,
+                self.temperature,
+                PREFERENCES_PROMPT,
+                preferences_str,
+                chat_history,
+                normalize_message(user_input),
+            ),
+            semantic_text=f"{preferences_str}\n{user_input}" if first_turn else None,
         )
 
-        # Actualizar historial con la respuesta
-        self.chat_history.append({"role": "assistant", "content": response.content})
-
-        # Actualizar la fecha de última interacción
-        updated_data["ultima_interaccion"] = datetime.now().isoformat()
+    async def _generate_response_with_extraction(
+        self, user_input: str, user_data: Dict[str, Any], chat_history: str, first_turn: bool
+    ) -> Tuple[str, PropertyPreference]:
+        """Genera la respuesta y extrae las preferencias del mensaje en una sola llamada.
 
-        return response.content, updated_data
+        Args:
+            user_input: Mensaje del usuario
+            user_data: Datos del usuario a considerar como preferencias conocidas
+            chat_history: Historial de la sesión formateado para el prompt
+            first_turn: Si el asistente aún no respondió en la sesión
 
-    def _extract_structured_preferences(self, text: str) -> PropertyPreference:
-        """Extrae preferencias inmobiliarias del texto usando modelo estructurado."""
+        Returns:
+            Tupla con la respuesta generada y las preferencias extraídas
+        """
+        preferences = PropertyPreference()
         try:
-            # Usar el modelo para extraer preferencias estructuradas
-            extraction_result = self.model.with_structured_output(PropertyPreference).invoke(
-                self.extraction_prompt.format(text=text)
-            )
-            return extraction_result
-        except Exception as e:
-            print(f"Error extrayendo preferencias estructuradas: {e}")
-            # Fallback a un objeto de PropertyPreference con valores predeterminados
-            return PropertyPreference(
-                tipo_inmueble=None,
-                presupuesto_min=None,
-                presupuesto_max=None,
-                moneda=None,
-                metraje=None,
-                habitaciones=None,
-                distrito=None,
-                timeline_compra=None
+            async with provider_slot(self.model_with_extraction):
+                response = await self.model_with_extraction.ainvoke(
+                    self.prompt.format_messages(
+                        input=user_input,
+                        chat_history=chat_history,
+                        known_preferences=self._format_preferences(user_data),
+                    )
+                )
+            for tool_call in response.tool_calls:
+                if tool_call["name"] == PropertyPreference.__name__:
+                    preferences = PropertyPreference(**tool_call["args"])
+            response_content = self._text_content(response.content)
+        except Exception:
+            logger.exception("Error extrayendo preferencias estructuradas")
+            response_content = ""
+
+        # Si el modelo solo llamó a la herramienta (o falló), generar la respuesta aparte
+        if not response_content:
+            known_data = {
+                **user_data,
+                **{k: v for k, v in preferences.__dict__.items() if v is not None},
+            }
+            response_content = await self._generate_response(
+                user_input, known_data, chat_history, first_turn
             )
 
+        return response_content, preferences
+
+    @staticmethod
+    def _text_content(content: Any) -> str:
+        """Obtiene el texto de la respuesta, que con herramientas puede venir en bloques."""
+        if isinstance(content, str):
+            return content
+        return "".join(
+            block.get("text", "")
+            for block in content
+            if isinstance(block, dict) and block.get("type") == "text"
+        )
+
     @staticmethod
     def _format_preferences(data: Dict[str, Any]) -> str:
         """Formatea las preferencias conocidas para incluirlas en el prompt."""
         if not data:
             return "No se conocen preferencias del usuario todavía."
 
-        relevant_keys = [
-            "tipo_inmueble",
-            "presupuesto_min",
-            "presupuesto_max",
-            "metraje",
-            "habitaciones",
-            "distrito",
-            "timeline_compra",
-        ]
-
-        # Mapeo de claves a nombres más amigables
-        key_mapping = {
-            "tipo_inmueble": "Tipo de inmueble",
-            "presupuesto_min": "Presupuesto mínimo",
-            "presupuesto_max": "Presupuesto máximo",
-            "metraje": "Metraje aproximado",
-            "habitaciones": "Número de habitaciones",
-            "distrito": "Distrito de interés",
-            "timeline_compra": "Plazo para la compra",
-        }
-
-        # Filtrar solo las claves relevantes que existen en los datos
-        existing_keys = [k for k in relevant_keys if k in data and data[k]]
-
-        if not existing_keys:
-            return "No se conocen preferencias inmobiliarias del usuario todavía."
-
-        # Formatear los datos
-        formatted = ""
-        for key in existing_keys:
-            formatted += f"- {key_mapping[key]}: {data[key]}\n"
-
-        return formatted
-
-    def _format_history(self) -> str:
-        """Formatea el historial de conversación para incluirlo en el prompt."""
-        if not self.chat_history:
-            return ""
-
-        formatted_history = ""
-        for msg in self.chat_history[-6:]:  # Limitamos a los últimos 6 mensajes
-            role = "Usuario" if msg["role"] == "user" else "Asistente"
-            formatted_history += f"{role}: {msg['content']}\n\n"
-
-        return formatted_history
+        lines = [f"- {label}: {data[key]}\n" for key, label in _PREFERENCE_LABELS if data.get(key)]
+
+        return "".join(lines) or "No se conocen preferencias inmobiliarias del usuario todavía."
 
     def reset(self) -> None:
-        """Reinicia el estado del agente."""
-        self.chat_history = []
+        """Reinicia el estado del agente.
+
+        El agente ya no guarda estado por conversación; se conserva por compatibilidad.
+        """
 
     # Métodos adicionales para integración con LangGraph
     def get_prompt(self):
@@ -0,0 +1,140 @@
+"""Extracción local de preferencias inmobiliarias.
+
+Módulo sin dependencias de LangChain, al igual que `collector_extraction`,
+para detectar con expresiones regulares los datos numéricos más comunes
+sin depender de una llamada al LLM.
+
+La extracción principal del agente de preferencias es la herramienta del modelo;
+este módulo la complementa: interpreta montos, metrajes y habitaciones de forma
+determinista (sus valores prevalecen sobre los del modelo) y le sirve al
+supervisor para saber si un mensaje trae datos.
+"""
+
+import re
+from typing import Any, Dict, Optional
+
+# Tabla para quitar tildes antes de buscar; los patrones se escriben sin tildes.
+# La ñ se conserva porque distingue palabras ("año")
+_DEACCENT = str.maketrans("áéíóúü", "aeiouu")
+
+# Patrones precompilados; cada categoría es una sola alternación
+_METRAJE_RE = re.compile(r"([0-9]+)\s*(?:m2|m²|metros(?:\s*cuadrados)?)")
+_HABITACIONES_RE = re.compile(r"([0-9]+)\s*(?:habitacion(?:es)?|cuartos?|dormitorios?|dorm)\b")
+# Montos con su moneda en una sola pasada: "$ 150,000", "S/ 2500", "300 mil soles"
+_PRICE_RE = re.compile(
+    r"(?:us)?\$\s*(?P<usd>[0-9][0-9.,]*)"
+    r"|s/\.?\s*(?P<pen>[0-9][0-9.,]*)"
+    r"|(?P<num>[0-9][0-9.,]*)\s*(?P<mil>mil\s*)?(?P<cur>soles|sol|dolares|usd)\b"
+)
+# Tipo de inmueble y plazo: un grupo con nombre por valor; "casa de playa" va antes
+# que "casa" para que gane la coincidencia más específica en la misma posición
+_PROPERTY_TYPE_RE = re.compile(
+    r"\b(?:(?P<casa_de_playa>casa (?:de|en la) playa)"
+    r"|(?P<departamento>departamentos?|depas?|flats?|apartamentos?)"
+    r"|(?P<casa>casas?|chalets?|viviendas?)"
+    r"|(?P<terreno>terrenos?|lotes?|parcelas?)"
+    r"|(?P<oficina>oficinas?|locale?s? comercial(?:es)?))\b"
+)
+_PROPERTY_TYPES = {
+    "casa_de_playa": "casa de playa",
+    "departamento": "departamento",
+    "casa": "casa",
+    "terreno": "terreno",
+    "oficina": "oficina",
+}
+_TIMELINE_RE = re.compile(
+    r"\b(?:(?P<inmediato>inmediat[oa]|urgente|ya mismo|lo antes posible|este mes)"
+    r"|(?P<corto>proximo mes|(?:un|1|2|3|dos|tres) mes(?:es)?)"
+    r"|(?P<medio>(?:4|5|6|cuatro|cinco|seis) meses|medio año)"
+    r"|(?P<largo>(?:un|1) año|(?:[7-9]|1[0-2]) meses|proximo año))\b"
+)
+_TIMELINES = {
+    "inmediato": "inmediato",
+    "corto": "1-3 meses",
+    "medio": "3-6 meses",
+    "largo": "6+ meses",
+}
+# Filtro barato: sin dígitos ni raíces de palabras clave ("ok", "gracias", emojis)
+# ningún patrón puede coincidir y se omite el resto de la extracción
+_SIGNAL_RE = re.compile(
+    r"[0-9]|depa|flat|apartamento|casa|chalet|vivienda|terreno|lote|parcela|oficina|local"
+    r"|inmediat|urgente|ya mismo|antes posible|mes|año",
+    re.IGNORECASE,
+)
+# Separadores de miles ("150,000" o "150.000")
+_THOUSANDS_SEP_RE = re.compile(r"[.,](?=[0-9]{3}(?![0-9]))")
+
+
+def extract_preferences(text: str) -> Dict[str, Any]:
+    """Extrae tipo de inmueble, plazo, metraje, habitaciones y presupuesto del texto.
+
+    Args:
+        text: Mensaje del usuario
+
+    Returns:
+        Diccionario solo con los campos encontrados
+    """
+    extracted: Dict[str, Any] = {}
+    if not _SIGNAL_RE.search(text):
+        return extracted
+
+    lowered = text.lower().translate(_DEACCENT)
+
+    # Extraer tipo de inmueble
+    property_match = _PROPERTY_TYPE_RE.search(lowered)
+    if property_match and property_match.lastgroup:
+        extracted["tipo_inmueble"] = _PROPERTY_TYPES[property_match.lastgroup]
+
+    # Extraer plazo de compra
+    timeline_match = _TIMELINE_RE.search(lowered)
+    if timeline_match and timeline_match.lastgroup:
+        extracted["timeline_compra"] = _TIMELINES[timeline_match.lastgroup]
+
+    # Extraer metraje ("120 m2", "80 metros cuadrados")
+    metraje_match = _METRAJE_RE.search(lowered)
+    if metraje_match:
+        extracted["metraje"] = int(metraje_match.group(1))
+
+    # Extraer número de habitaciones ("3 habitaciones", "2 dorm")
+    habitaciones_match = _HABITACIONES_RE.search(lowered)
+    if habitaciones_match:
+        extracted["habitaciones"] = int(habitaciones_match.group(1))
+
+    # Extraer presupuesto: un monto es el máximo; con dos o más se toma el rango
+    prices = []
+    currency = None
+    for price_match in _PRICE_RE.finditer(lowered):
+        amount = _parse_amount(
+            price_match.group("usd") or price_match.group("pen") or price_match.group("num")
+        )
+        if amount is None:
+            continue
+        if price_match.group("mil"):
+            amount *= 1000
+        prices.append(amount)
+        if currency is None:
+            is_usd = price_match.group("usd") or price_match.group("cur") in ("dolares", "usd")
+            currency = "dólares" if is_usd else "soles"
+
+    if prices:
+        if len(prices) > 1:
+            extracted["presupuesto_min"] = min(prices)
+        extracted["presupuesto_max"] = max(prices)
+        extracted["moneda"] = currency
+
+    return extracted
+
+
+def _parse_amount(raw: str) -> Optional[float]:
+    """Convierte un monto escrito por el usuario a número.
+
+    Args:
+        raw: Monto tal como aparece en el mensaje (por ejemplo "150,000")
+
+    Returns:
+        Monto numérico, o None si no es válido
+    """
+    try:
+        return float(_THOUSANDS_SEP_RE.sub("", raw).replace(",", ".").rstrip("."))
+    except ValueError:
+        return None
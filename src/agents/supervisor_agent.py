@@ -5,33 +5,121 @@ y decide qué agente especializado debe manejar cada mensaje.
 """
 
 import logging
-from datetime import datetime
-from typing import Any, Dict, Literal, Optional, TypedDict, List, Union
+import re
+import time
+from contextlib import aclosing
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Dict, Literal, Optional, Tuple, List, Union, cast
 
 # Corrigiendo la importación de Message
 from langchain_core.messages import (
     HumanMessage,
     AIMessage,
+    AIMessageChunk,
     BaseMessage as Message
 )
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableConfig
-from langchain_openai import ChatOpenAI
+from langchain_core.utils.json import parse_partial_json
 from langgraph.constants import END
 from langgraph.types import Command
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
+from src.agents.collector_extraction import extract_contact_data
+from src.agents.location_agent import extract_location
+from src.agents.preferences_extraction import extract_preferences
 from src.config.settings import get_settings
-from src.models.lead_data import LeadData
-from src.services.analytics_client import track_agent_assignment
+from src.models.lead_data import P9_FIELDS, P10_FIELDS, LeadData
+from src.services.analytics_client import analytics_batcher, truncate
+from src.services.llm_cache import is_cacheable, normalize_message, response_cache
+from src.services.llm_client import cached_system_message, create_chat_model, provider_slot
+from src.services.semantic_cache import get_semantic_cache
+from src.services.semantic_router import get_semantic_router
 
 logger = logging.getLogger(__name__)
 
+# Palabras clave del ruteo por reglas, compiladas en una sola alternación con un
+# grupo por categoría para revisar el mensaje en una pasada
+_KEYWORD_GROUPS = {
+    "farewell": ("gracias", "adios", "adiós", "chau", "hasta luego", "terminar", "finalizar"),
+    "preferences": ("precio", "costo", "presupuesto", "habitacion", "habitación", "cuarto"),
+    "location": ("zona", "distrito", "ubicacion", "ubicación", "lugar", "donde"),
+    "collector": ("nombre", "llamo", "contacto", "celular", "teléfono", "email", "correo"),
+}
+_KEYWORDS_RE = re.compile(
+    "|".join(
+        f"(?P<{group}>{'|'.join(map(re.escape, words))})"
+        for group, words in _KEYWORD_GROUPS.items()
+    )
+)
+
+# Dígitos y arrobas delatan datos (teléfonos, montos, metrajes, correos)
+_DATA_SIGNAL_RE = re.compile(r"[0-9@]")
+
+
+def carries_lead_data(message: str) -> bool:
+    """Indica si el mensaje trae datos del lead según los extractores locales.
+
+    Las decisiones de estos mensajes no se buscan en la caché semántica: un mensaje
+    parecido a otro sin datos devolvería una decisión con `extracted` vacío.
+    """
+    return bool(
+        _DATA_SIGNAL_RE.search(message)
+        or extract_contact_data(message)
+        or extract_preferences(message)
+        or extract_location(message)
+    )
+
+
+# Nombres amigables de los campos del lead para los prompts
+_LEAD_DATA_LABELS = {
+    "nombre": "Nombre",
+    "tipo_inmueble": "Tipo de inmueble",
+    "consentimiento": "Consentimiento otorgado",
+    "celular": "Número de celular",
+    "email": "Correo electrónico",
+    "distrito": "Distrito de interés",
+    "zona": "Zona",
+    "metraje": "Metraje (m²)",
+    "habitaciones": "Número de habitaciones",
+    "presupuesto_min": "Presupuesto mínimo",
+    "presupuesto_max": "Presupuesto máximo",
+    "tipo_documento": "Tipo de documento",
+    "numero_documento": "Número de documento",
+    "timeline_compra": "Plazo para compra",
+}
+
+
+def _format_lead_value(key: str, value: Any) -> Any:
+    """Formatea los valores especiales del lead (consentimiento y presupuestos)."""
+    if key == "consentimiento" and value is True:
+        return "Sí"
+    if key == "presupuesto_min" or key == "presupuesto_max":
+        try:
+            return f"S/ {float(value):,.2f}"
+        except (ValueError, TypeError):
+            pass
+    return value
+
+
+@lru_cache(maxsize=256)
+def _render_lead_data(items: Tuple[Tuple[str, Any], ...]) -> str:
+    """Construye el bloque de datos del lead a partir de sus pares clave-valor."""
+    return "".join(
+        f"- {_LEAD_DATA_LABELS.get(key, key)}: {_format_lead_value(key, value)}\n"
+        for key, value in items
+    )
+
+
+# Mensajes del historial que se envían al supervisor como contexto
+_RECENT_HISTORY_WINDOW = 6
 
-class RouterResponse(TypedDict):
-    """Respuesta del supervisor para ruteo."""
-    next: Literal["legal", "collector", "location", "preferences", "END"]
-    reasoning: str
+# Agentes a los que puede rutear el supervisor
+_ROUTES = frozenset(("legal", "collector", "location", "preferences", "END"))
+
+# Agentes especializados que pueden atender un mismo mensaje en paralelo
+_PARALLEL_AGENTS = frozenset(("collector", "location", "preferences"))
 
 
 class ExtractedData(BaseModel):
@@ -50,27 +138,48 @@ class ExtractedData(BaseModel):
     consentimiento: Optional[bool] = Field(None, description="Si el usuario ha dado consentimiento para procesar sus datos")
     timeline_compra: Optional[str] = Field(None, description="Plazo estimado para la compra")
 
-    class Config:
-        extra = "ignore"
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
 
 
-class SupervisorAgent:
-    """Agente supervisor que coordina la conversación de manera no secuencial."""
+# Campos necesarios para generar el resumen del lead con plantilla
+_SUMMARY_REQUIRED_FIELDS = P10_FIELDS + P9_FIELDS
 
-    def __init__(self, model_name: str = "claude-3-5-sonnet-latest"):
-        """Inicializa el agente supervisor.
-
-        Args:
-            model_name: Nombre del modelo a utilizar
-        """
-        self.model = ChatOpenAI(model=model_name, temperature=0.2)
-        settings = get_settings()
+_SUMMARY_NEXT_STEP = (
+    "Siguiente paso: contactar al cliente para coordinar visitas a inmuebles "
+    "que se ajusten a su búsqueda."
+)
 
-        # Sistema de prioridades para datos
-        self.priorities = settings["lead_priorities"]
 
-        # Carga prompts configurados
-        self.router_prompt = """
+def _format_budget(minimum: Optional[float], maximum: Optional[float]) -> str:
+    """Formatea el rango de presupuesto del lead para el resumen."""
+    if minimum is not None and maximum is not None:
+        return f"S/ {minimum:,.0f} – S/ {maximum:,.0f}"
+    if maximum is not None:
+        return f"hasta S/ {maximum:,.0f}"
+    if minimum is not None:
+        return f"desde S/ {minimum:,.0f}"
+    return "no indicado"
+
+
+class SupervisorDecision(BaseModel):
+    """Decisión del supervisor: datos extraídos del mensaje y agente que debe manejarlo."""
+
+    extracted: ExtractedData = Field(
+        default_factory=ExtractedData,
+        description="Información explícitamente mencionada en el mensaje actual del usuario",
+    )
+    next: Literal["legal", "collector", "location", "preferences", "END"] = Field(
+        description="Agente que debe manejar el mensaje"
+    )
+    parallel: List[Literal["collector", "location", "preferences"]] = Field(
+        default_factory=list,
+        description="Otros agentes especializados que deben atender el mismo mensaje en paralelo",
+    )
+    reasoning: str = Field("", description="Razón breve de la elección del agente")
+
+
+# Prompt del supervisor para decidir el ruteo
+ROUTER_PROMPT = """
         Eres un supervisor de conversación para un asistente inmobiliario en Perú.
         Tu trabajo es analizar cada mensaje del usuario y determinar qué agente especializado 
         debe manejarlo, basándote en el contexto actual y el estado del lead.
@@ -88,18 +197,18 @@ class SupervisorAgent:
         - Si el mensaje contiene preferencias inmobiliarias, asigna "preferences"
         - Si necesitas datos personales básicos, asigna "collector"
         - Si el usuario indica que ha terminado o agradece, considera "END"
+        - Si el mensaje trae información para varios agentes especializados (collector,
+          location, preferences), asigna el principal en "next" y los demás en "parallel"
         
         Basándote en el contexto y los datos ya recolectados, determina el mejor agente
         para continuar la conversación de forma natural, sin seguir un orden secuencial rígido.
         """
 
-        # Prompt para extracción estructurada
-        self.extraction_prompt = """
+# Prompt para extracción estructurada
+EXTRACTION_PROMPT = """
         Extrae toda la información relevante del mensaje del usuario para un contexto inmobiliario.
         Solo incluye la información explícitamente mencionada en este mensaje.
         
-        Mensaje del usuario: {text}
-        
         Debes extraer:
         - nombre: Nombre del cliente si lo menciona
         - email: Correo electrónico si aparece en el mensaje
@@ -118,10 +227,47 @@ class SupervisorAgent:
         Para consentimiento, marca como true solo si hay una aceptación explícita para tratar sus datos personales.
         """
 
-        self.extraction_prompt_template = ChatPromptTemplate.from_messages([
-            ("system", self.extraction_prompt),
-            ("human", "{text}")
-        ])
+EXTRACTION_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system", EXTRACTION_PROMPT),
+    ("human", "{text}")
+])
+
+# Un solo prompt para extraer datos y decidir el ruteo en la misma llamada
+DECISION_PROMPT = f"{ROUTER_PROMPT}\n{EXTRACTION_PROMPT}"
+
+
+class SupervisorAgent:
+    """Agente supervisor que coordina la conversación de manera no secuencial."""
+
+    def __init__(self, model_name: str = "claude-3-5-sonnet-latest"):
+        """Inicializa el agente supervisor.
+
+        Args:
+            model_name: Nombre del modelo a utilizar
+        """
+        self.model_name = model_name
+        self.temperature = 0.2
+        self.model = create_chat_model(model_name, self.temperature)
+        # La decisión se fuerza como llamada a herramienta para leerla en streaming
+        self.decision_model = self.model.bind_tools(
+            [SupervisorDecision], tool_choice=SupervisorDecision.__name__
+        )
+        # Ruteo local por embeddings para mensajes evidentes (None si está deshabilitado)
+        self.semantic_router = get_semantic_router()
+        settings = get_settings()
+
+        # Sistema de prioridades para datos
+        self.priorities = settings["lead_priorities"]
+
+        # Prompts compartidos por todas las instancias, construidos al importar el módulo
+        self.router_prompt = ROUTER_PROMPT
+        self.extraction_prompt = EXTRACTION_PROMPT
+        self.extraction_prompt_template = EXTRACTION_PROMPT_TEMPLATE
+
+        # Un solo prompt para extraer datos y decidir el ruteo en la misma llamada.
+        # Es el prefijo estático que el proveedor cachea; el contexto dinámico va detrás
+        self.decision_prompt = DECISION_PROMPT
+        self._decision_system_message = cached_system_message(DECISION_PROMPT, self.model)
 
     async def extract_information(self, message: str) -> Dict[str, Any]:
         """Extrae toda la información posible de un mensaje en una sola pasada usando modelo estructurado.
@@ -134,9 +280,10 @@ class SupervisorAgent:
         """
         try:
             # Usar el modelo para extraer datos estructurados
-            extraction_result = self.model.with_structured_output(ExtractedData).invoke(
-                self.extraction_prompt_template.format(text=message)
-            )
+            async with provider_slot(self.model):
+                extraction_result = await self.model.with_structured_output(ExtractedData).ainvoke(
+                    self.extraction_prompt_template.format_messages(text=message)
+                )
 
             # Convertir a diccionario, excluyendo valores None
             extracted_data = extraction_result.model_dump(exclude_none=True)
@@ -159,8 +306,9 @@ class SupervisorAgent:
     async def router_node(self, state: Dict[str, Any], config: RunnableConfig) -> Command:
         """Nodo que determina qué agente debe manejar el mensaje actual.
 
-        Este método procesa cada mensaje del usuario, extrae información en una sola pasada
-        y decide qué agente especializado debe manejarlo, sin seguir un flujo secuencial.
+        Este método procesa cada mensaje del usuario y, en una sola llamada al modelo,
+        extrae su información y decide qué agente especializado debe manejarlo, sin
+        seguir un flujo secuencial.
 
         Args:
             state: Estado actual del grafo
@@ -176,92 +324,272 @@ class SupervisorAgent:
         if not current_message:
             return Command(goto="legal", update={"last_agent": "supervisor"})
 
-        # Extraer automáticamente toda la información posible
-        extraction_result = await self.extract_information(current_message)
-        high_confidence_data = {k: v for k, v in extraction_result["extracted"].items()
-                              if extraction_result["confidence"].get(k, 0) >= 70}
-
-        # Actualizar datos del lead con información extraída
-        lead_data = state.get("lead_data", {}).copy() if isinstance(state.get("lead_data"), dict) else {}
-        lead_data.update(high_confidence_data)
+        # Los datos del estado no se modifican
+        lead_data = state.get("lead_data")
+        if not isinstance(lead_data, dict):
+            lead_data = {}
 
-        # Verificar si ya existe el objeto LeadData
+        # Los agentes solo escriben `lead_data`; el supervisor, que nunca corre en
+        # paralelo, sincroniza `lead_obj` sobre una copia para no modificar el objeto
+        # que guardan el estado anterior y el checkpoint. Los datos ya vienen tipados
+        # por los extractores y la salida estructurada, así que se omite la validación
         lead_obj = state.get("lead_obj")
         if lead_obj:
-            lead_obj.update_from_dict(high_confidence_data)
+            lead_obj = lead_obj.model_copy(deep=True)
+            lead_obj.update_from_dict(lead_data, validate=False)
         else:
-            lead_obj = LeadData(**lead_data)
-
-        # Actualizar fecha de última interacción
-        if lead_obj and lead_obj.metadata:
-            lead_obj.metadata.ultima_interaccion = datetime.now().isoformat()
-
-        # Construir mensajes para el modelo
-        messages = [
-            {"role": "system", "content": self.router_prompt},
-        ]
-
-        # Añadir contexto sobre datos ya recolectados
-        lead_data_summary = self._format_lead_data(lead_data)
-        messages.append({"role": "system", "content": f"Datos ya recolectados:\n{lead_data_summary}"})
-
-        # Añadir análisis de lo que falta
-        missing_fields = lead_obj.get_missing_fields(10) if lead_obj else self.priorities["P10"]
-        messages.append({"role": "system", "content": f"Campos obligatorios faltantes: {', '.join(missing_fields)}"})
-
-        # Añadir historial reciente (últimos mensajes para dar contexto)
-        recent_history = self._format_recent_history(state.get("messages", []))
-        messages.extend(recent_history)
-
-        # Añadir mensaje actual
-        messages.append({"role": "user", "content": current_message})
+            lead_obj = LeadData.model_construct(**lead_data)
+
+        # Rutas sin LLM; los datos del mensaje los extrae el agente especializado.
+        # Sin consentimiento el agente legal es obligatorio, así que no hace falta
+        # consultar al modelo ni extraer datos personales antes de la autorización;
+        # si el agente legal ya respondió el mensaje, se espera al usuario.
+        # Con consentimiento, los mensajes evidentes se rutean por similitud semántica
+        # solo si ningún agente respondió todavía el mensaje actual
+        answered = self._last_message_role(state.get("messages", [])) == "assistant"
+        local_route = None
+        parallel_agents: List[str] = []
+        if not lead_data.get("consentimiento"):
+            local_route = "END" if answered else "legal"
+            reasoning = "Regla: falta el consentimiento"
+        elif self.semantic_router is not None and not answered:
+            local_route = await self.semantic_router.aroute(current_message)
+            reasoning = "Ruteo semántico local"
+
+        if local_route is not None:
+            high_confidence_data = {}
+            next_agent = local_route
+        else:
+            # Construir mensajes para el modelo: primero el prompt estático cacheable y
+            # después, en mensajes aparte, los datos que cambian en cada turno
+            messages: List[Union[Dict[str, Any], Message]] = [self._decision_system_message]
+
+            # Añadir contexto sobre datos ya recolectados
+            lead_data_summary = self._format_lead_data(lead_data)
+            messages.append({"role": "system", "content": f"Datos ya recolectados:\n{lead_data_summary}"})
+
+            # Añadir análisis de lo que falta
+            missing_fields = lead_obj.get_missing_fields(10)
+            messages.append({"role": "system", "content": f"Campos obligatorios faltantes: {', '.join(missing_fields)}"})
+
+            # Añadir el resumen de los mensajes antiguos que ya salieron del historial
+            summary = (state.get("context") or {}).get("summary")
+            if summary:
+                messages.append(
+                    {"role": "system", "content": f"Resumen de la conversación anterior:\n{summary}"}
+                )
 
-        # Determinar el siguiente agente
-        try:
-            response = self.model.with_structured_output(RouterResponse).invoke(messages)
-            next_agent = response["next"]
-            reasoning = response.get("reasoning", "")
-
-            # Registrar la decisión para analytics
-            if isinstance(config, dict) and config.get("configurable") and config["configurable"].get("thread_id"):
-                thread_id = config["configurable"]["thread_id"]
-                track_agent_assignment(
-                    thread_id=thread_id,
-                    user_message=current_message[:100] + "..." if len(current_message) > 100 else current_message,
-                    assigned_agent=next_agent
+            # Añadir historial reciente (últimos mensajes para dar contexto)
+            recent_history = self._format_recent_history(state.get("messages", []))
+            messages.extend(recent_history)
+
+            # Añadir mensaje actual
+            messages.append({"role": "user", "content": current_message})
+
+            # Extraer información y determinar el siguiente agente en una sola llamada
+            try:
+                decision = await self._decide(
+                    messages,
+                    key_parts=(
+                        self.model_name,
+                        self.temperature,
+                        self.decision_prompt,
+                        lead_data_summary,
+                        missing_fields,
+                        self._last_assistant_message(recent_history),
+                        normalize_message(current_message),
+                    ),
+                    semantic_text=None
+                    if carries_lead_data(current_message)
+                    else "\n".join(
+                        (
+                            ",".join(sorted(k for k, v in lead_data.items() if v is not None)),
+                            self._last_assistant_message(recent_history),
+                            current_message,
+                        )
+                    ),
                 )
+                next_agent = decision.next
+                reasoning = decision.reasoning
+                parallel_agents = [
+                    agent
+                    for agent in dict.fromkeys(decision.parallel)
+                    if agent != next_agent and next_agent in _PARALLEL_AGENTS
+                ]
+                # Recién validado: se lee __dict__ directamente en vez de pasar por model_dump
+                high_confidence_data = {
+                    key: value
+                    for key, value in decision.extracted.__dict__.items()
+                    if value is not None
+                }
+
+                logger.info(f"Router decidió: {next_agent}, razón: {reasoning}")
+
+            except (KeyError, ValueError, TypeError) as e:
+                # En caso de error, usar la lógica de fallback sin datos extraídos
+                logger.error(f"Error en router_node: {str(e)}")
+                high_confidence_data = {}
+                next_agent = self.decide_next_agent(state)
+                reasoning = f"Fallback: error en LLM - {str(e)[:100]}"
+
+        # Registrar la decisión para analytics en segundo plano, fuera del turno
+        if isinstance(config, dict) and config.get("configurable") and config["configurable"].get("thread_id"):
+            analytics_batcher.enqueue(
+                thread_id=config["configurable"]["thread_id"],
+                event_type="agent_assignment",
+                event_data={
+                    "user_message": truncate(current_message, 100),
+                    "assigned_agent": next_agent,
+                },
+            )
 
-            logger.info(f"Router decidió: {next_agent}, razón: {reasoning}")
+        # Actualizar el objeto del lead con la información extraída
+        if high_confidence_data:
+            lead_obj.update_from_dict(high_confidence_data, validate=False)
 
-        except (KeyError, ValueError, TypeError) as e:
-            # En caso de error, usar la lógica de fallback
-            logger.error(f"Error en router_node: {str(e)}")
-            next_agent = self.decide_next_agent(state)
-            reasoning = f"Fallback: error en LLM - {str(e)[:100]}"
+        # Actualizar fecha de última interacción
+        lead_obj.mark_interaction(datetime.now(timezone.utc).isoformat())
 
-        # Guardar la decisión de ruteo para análisis
-        routing_decisions = state.get("routing_decisions", [])
-        routing_decisions.append({
-            "timestamp": datetime.now().isoformat(),
-            "message": current_message[:50] + "..." if len(current_message) > 50 else current_message,
+        # Guardar la decisión de ruteo para análisis (el reducer del estado la añade al final).
+        # La hora se guarda en nanosegundos UTC y se formatea solo al analizarla
+        routing_decision = {
+            "timestamp_ns": time.time_ns(),
+            "message": truncate(current_message, 50),
             "next_agent": next_agent,
+            "parallel_agents": parallel_agents,
             "reasoning": reasoning
-        })
+        }
 
         # Actualizar estado
         updates = {
-            "lead_data": lead_data,
+            # El reducer combina los campos extraídos con los datos del estado
+            "lead_data": high_confidence_data,
             "lead_obj": lead_obj,
             "last_agent": "supervisor",
             "next": next_agent,
-            "routing_decisions": routing_decisions
+            "routing_decisions": [routing_decision]
         }
 
         if next_agent == "END":
             return Command(goto=END, update=updates)
 
+        # Los agentes adicionales corren en la misma superetapa del grafo; los reducers
+        # del estado combinan sus datos del lead y sus mensajes
+        if parallel_agents:
+            return Command(goto=[next_agent, *parallel_agents], update=updates)
+
         return Command(goto=next_agent, update=updates)
 
+    async def _decide(
+        self,
+        messages: List[Union[Dict[str, Any], Message]],
+        key_parts: Tuple[Any, ...],
+        semantic_text: Optional[str] = None,
+    ) -> SupervisorDecision:
+        """Obtiene la decisión del modelo, reutilizando una cacheada si es posible.
+
+        La clave incluye todo lo que determina la decisión salvo el historial
+        completo: los datos del lead, los campos faltantes, la última pregunta del
+        asistente y el mensaje normalizado. Así, mensajes repetidos en la misma
+        etapa de la conversación ("sí", "acepto") no vuelven a invocar al modelo.
+
+        Si la caché semántica está habilitada, también se reutilizan decisiones de
+        mensajes equivalentes ("ok", "dale") en la misma etapa. Solo se guardan las
+        decisiones sin datos extraídos: dos mensajes parecidos pueden traer datos
+        distintos ("me llamo Ana" y "me llamo Luis").
+
+        Args:
+            messages: Mensajes para el modelo
+            key_parts: Componentes que determinan la decisión
+            semantic_text: Campos presentes del lead, última pregunta y mensaje, para la
+                búsqueda semántica; si se omite (por ejemplo, porque el mensaje trae
+                datos) no se usa esa caché
+
+        Returns:
+            Decisión del supervisor
+        """
+        cache_key = None
+        if is_cacheable(self.temperature):
+            cache_key = response_cache.cache_key("supervisor", *key_parts)
+            cached_decision = response_cache.get(cache_key)
+            if cached_decision is not None:
+                return SupervisorDecision.model_validate_json(cached_decision)
+
+        semantic_cache = get_semantic_cache("supervisor") if semantic_text is not None else None
+        if semantic_cache is not None and semantic_text is not None:
+            cached_decision = await semantic_cache.alookup(semantic_text)
+            if cached_decision is not None:
+                return SupervisorDecision.model_validate_json(cached_decision)
+
+        decision = await self._astream_decision(messages)
+
+        if cache_key is not None:
+            response_cache.set(cache_key, decision.model_dump_json())
+        if semantic_cache is not None and semantic_text is not None and all(
+            value is None for value in decision.extracted.__dict__.values()
+        ):
+            await semantic_cache.aadd(semantic_text, decision.model_dump_json())
+
+        return decision
+
+    async def _astream_decision(
+        self, messages: List[Union[Dict[str, Any], Message]]
+    ) -> SupervisorDecision:
+        """Obtiene la decisión del modelo sin esperar a que termine de escribir la razón.
+
+        La decisión se pide como llamada a herramienta y sus argumentos se leen en
+        streaming. Los campos llegan en el orden del esquema, así que cuando empieza
+        `reasoning` los datos extraídos y el agente elegido ya están completos y se
+        corta el stream; la razón queda truncada, pero solo se usa para los logs.
+
+        Args:
+            messages: Mensajes para el modelo
+
+        Returns:
+            Decisión del supervisor
+        """
+        args = ""
+        parsed: Dict[str, Any] = {}
+        # astream devuelve un generador asíncrono de fragmentos; aclosing lo cierra al cortar
+        stream = cast(
+            AsyncGenerator[AIMessageChunk, None], self.decision_model.astream(messages)
+        )
+        async with provider_slot(self.decision_model), aclosing(stream):
+            async for chunk in stream:
+                new_args = "".join(
+                    tool_chunk.get("args") or "" for tool_chunk in chunk.tool_call_chunks
+                )
+                if not new_args:
+                    continue
+                args += new_args
+                parsed = parse_partial_json(args) or parsed
+                if (
+                    next(reversed(parsed), None) == "reasoning"
+                    and "extracted" in parsed
+                    and parsed.get("next") in _ROUTES
+                ):
+                    break
+
+        return SupervisorDecision.model_validate(parsed)
+
+    @staticmethod
+    def _last_message_role(messages: List[Union[Dict[str, Any], Message]]) -> Optional[str]:
+        """Obtiene el rol del último mensaje del historial, o None si está vacío."""
+        if not messages:
+            return None
+        last = messages[-1]
+        if isinstance(last, dict):
+            return last.get("role")
+        return "assistant" if isinstance(last, AIMessage) else "user"
+
+    @staticmethod
+    def _last_assistant_message(messages: List[Dict[str, Any]]) -> str:
+        """Obtiene el último mensaje del asistente, al que suele responder el usuario."""
+        for msg in reversed(messages):
+            if msg.get("role") == "assistant":
+                return str(msg.get("content", ""))
+        return ""
+
     @staticmethod
     def _format_recent_history(messages: List[Union[Dict[str, Any], Message]]) -> List[Dict[str, Any]]:
         """Formatea los mensajes recientes para proporcionar contexto al LLM.
@@ -274,10 +602,9 @@ class SupervisorAgent:
         """
         recent_messages = []
 
-        # Tomar los últimos 6 mensajes para no saturar el contexto
-        message_slice = messages[-6:] if len(messages) > 6 else messages
-
-        for msg in message_slice:
+        # Tomar solo los últimos mensajes para no saturar el contexto; el slice copia
+        # a lo sumo la ventana, sin importar el largo del historial
+        for msg in messages[-_RECENT_HISTORY_WINDOW:]:
             if isinstance(msg, dict):
                 recent_messages.append(msg)
             elif isinstance(msg, (HumanMessage, AIMessage)):
@@ -310,14 +637,18 @@ class SupervisorAgent:
         lead_data = state.get("lead_data", {})
         lead_obj = state.get("lead_obj")
 
-        # Verificar si ya existe un siguiente agente decidido
-        if state.get("next") and state["next"] != "supervisor":
-            return state["next"]
+        # Si un agente ya respondió el mensaje actual, se espera al usuario. No se
+        # reutiliza `state["next"]`: es el agente que acaba de responder y volver a
+        # él encadenaría supervisor y agente hasta agotar el límite de recursión
+        if SupervisorAgent._last_message_role(state.get("messages", [])) == "assistant":
+            return "END"
+
+        # Detectar en una sola pasada las categorías de palabras clave del mensaje actual
+        message = state.get("current_message", "").casefold()
+        keyword_hits = {match.lastgroup for match in _KEYWORDS_RE.finditer(message)}
 
         # Verificar palabras de despedida en el mensaje actual
-        message = state.get("current_message", "").lower()
-        farewell_words = ["gracias", "adios", "adiós", "chau", "hasta luego", "terminar", "finalizar"]
-        if any(word in message for word in farewell_words) and lead_data.get("consentimiento"):
+        if "farewell" in keyword_hits and lead_data.get("consentimiento"):
             return "END"
 
         # Priorizar consentimiento legal si no existe
@@ -350,11 +681,11 @@ class SupervisorAgent:
             return "END"
 
         # Si no hay una regla clara, volver al agente más adecuado según el contenido
-        if any(word in message for word in ["precio", "costo", "presupuesto", "habitacion", "habitación", "cuarto"]):
+        if "preferences" in keyword_hits:
             return "preferences"
-        elif any(word in message for word in ["zona", "distrito", "ubicacion", "ubicación", "lugar", "donde"]):
+        elif "location" in keyword_hits:
             return "location"
-        elif any(word in message for word in ["nombre", "llamo", "contacto", "celular", "teléfono", "email", "correo"]):
+        elif "collector" in keyword_hits:
             return "collector"
 
         # Por defecto, si no hay pistas claras y ya tenemos consentimiento,
@@ -367,44 +698,20 @@ class SupervisorAgent:
 
     @staticmethod
     def _format_lead_data(lead_data: Dict[str, Any]) -> str:
-        """Formatea los datos del lead para incluirlos en el prompt."""
+        """Formatea los datos del lead para incluirlos en el prompt.
+
+        Los datos cambian con poca frecuencia entre turnos, así que el texto se
+        memoriza según los pares clave-valor presentes.
+        """
         if not lead_data:
             return "No se han recolectado datos todavía."
 
-        # Mapeo para nombres más amigables
-        key_mapping = {
-            "nombre": "Nombre",
-            "tipo_inmueble": "Tipo de inmueble",
-            "consentimiento": "Consentimiento otorgado",
-            "celular": "Número de celular",
-            "email": "Correo electrónico",
-            "distrito": "Distrito de interés",
-            "zona": "Zona",
-            "metraje": "Metraje (m²)",
-            "habitaciones": "Número de habitaciones",
-            "presupuesto_min": "Presupuesto mínimo",
-            "presupuesto_max": "Presupuesto máximo",
-            "tipo_documento": "Tipo de documento",
-            "numero_documento": "Número de documento",
-            "timeline_compra": "Plazo para compra"
-        }
-
-        formatted = ""
-        for key, value in lead_data.items():
-            if value is not None:
-                display_key = key_mapping.get(key, key)
-                # Formatear valores especiales
-                if key == "consentimiento" and value is True:
-                    value = "Sí"
-                elif key == "presupuesto_min" or key == "presupuesto_max":
-                    try:
-                        value = f"S/ {float(value):,.2f}"
-                    except (ValueError, TypeError):
-                        pass
-
-                formatted += f"- {display_key}: {value}\n"
-
-        return formatted
+        items = tuple((key, value) for key, value in lead_data.items() if value is not None)
+        try:
+            return _render_lead_data(items)
+        except TypeError:
+            # Valores no hashables: formatear sin memorizar
+            return _render_lead_data.__wrapped__(items)
 
     async def generate_summary(self, state: Dict[str, Any]) -> Optional[str]:
         """Genera un resumen del estado actual del lead para transferencia al CRM.
@@ -422,6 +729,11 @@ class SupervisorAgent:
         try:
             lead_data = lead_obj.to_dict()
 
+            # Con un lead completo el resumen es determinista y no hace falta el LLM
+            templated = self._template_summary(lead_data)
+            if templated is not None:
+                return templated
+
             # Preparar un prompt para que el modelo genere un resumen
             prompt = f"""
             Genera un resumen conciso del lead inmobiliario con estos datos:
@@ -437,13 +749,48 @@ class SupervisorAgent:
             Formato el resumen en máximo 4-5 líneas, de manera profesional y directa.
             """
 
-            response = self.model.invoke([
-                {"role": "system", "content": "Eres un asistente especializado en inmobiliaria que genera resúmenes concisos para el CRM."},
-                {"role": "user", "content": prompt}
-            ])
+            async with provider_slot(self.model):
+                response = await self.model.ainvoke([
+                    {"role": "system", "content": "Eres un asistente especializado en inmobiliaria que genera resúmenes concisos para el CRM."},
+                    {"role": "user", "content": prompt}
+                ])
 
             return response.content
 
         except (KeyError, ValueError, TypeError, AttributeError) as e:
             logger.error(f"Error generando resumen: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+
+    @staticmethod
+    def _template_summary(lead_data: Dict[str, Any]) -> Optional[str]:
+        """Genera el resumen del lead con una plantilla si tiene todos los datos P10 y P9.
+
+        Args:
+            lead_data: Datos del lead sin valores nulos
+
+        Returns:
+            Resumen formateado, o None si el lead está incompleto y se necesita el LLM
+        """
+        if any(lead_data.get(field) is None for field in _SUMMARY_REQUIRED_FIELDS):
+            return None
+
+        search = (
+            f"Busca {lead_data['tipo_inmueble']} de {lead_data['metraje']} m² "
+            f"en {lead_data['distrito']}"
+        )
+        if lead_data.get("habitaciones"):
+            search += f", {lead_data['habitaciones']} habitaciones"
+
+        budget = _format_budget(lead_data.get("presupuesto_min"), lead_data.get("presupuesto_max"))
+        lines = [
+            f"Lead: {lead_data['nombre']} "
+            f"(celular: {lead_data['celular']}, email: {lead_data['email']}).",
+            f"{search}.",
+            f"Presupuesto: {budget}.",
+        ]
+        if lead_data.get("timeline_compra"):
+            lines.append(f"Plazo de compra: {lead_data['timeline_compra']}.")
+        lines.append(_SUMMARY_NEXT_STEP)
+
+        return "\n".join(lines)
+
@@ -0,0 +1,76 @@
+"""Configuración de logging no bloqueante para la aplicación.
+
+Los registros se encolan con un QueueHandler y un QueueListener los escribe en un
+hilo aparte, de modo que registrar un error no hace I/O síncrona en el event loop.
+"""
+
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from src.config.settings import get_settings
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(session_id)s] %(message)s"
+
+# Logger de la aplicación; LOG_LEVEL solo se aplica a él y a sus hijos (`src.*`)
+APP_LOGGER = "src"
+
+# Nivel de las librerías (httpx, anthropic, etc.), para que sus trazas no se
+# mezclen con el chat de la CLI
+ROOT_LOG_LEVEL = logging.WARNING
+
+# Loggers que escriben en cada turno (peticiones HTTP y decisiones del supervisor);
+# solo se muestran por debajo de WARNING cuando LOG_LEVEL es DEBUG
+QUIET_LOGGERS = ("httpx", "httpcore", "anthropic", "openai", "src.agents.supervisor_agent")
+
+# Listener activo; solo se configura una vez por proceso
+_listener: Optional[QueueListener] = None
+
+
+class _SessionFilter(logging.Filter):
+    """Completa `session_id` en los registros que no lo traen."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "session_id"):
+            record.session_id = "-"
+        return True
+
+
+def setup_logging(level: Optional[str] = None) -> QueueListener:
+    """Configura el logger raíz para escribir a través de una cola.
+
+    El logger raíz queda en WARNING y el nivel configurado se aplica a los loggers
+    de la aplicación, salvo a los de `QUIET_LOGGERS`, que no bajan de WARNING a
+    menos que el nivel sea DEBUG.
+
+    Args:
+        level: Nivel de logging de la aplicación; si se omite se usa LOG_LEVEL de
+            la configuración
+
+    Returns:
+        QueueListener en ejecución; debe detenerse con `stop()` al cerrar la aplicación
+    """
+    global _listener
+
+    if _listener is not None:
+        return _listener
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    stream_handler.addFilter(_SessionFilter())
+
+    root = logging.getLogger()
+    root.setLevel(ROOT_LOG_LEVEL)
+    root.addHandler(QueueHandler(log_queue))
+    app_logger = logging.getLogger(APP_LOGGER)
+    app_logger.setLevel(level or get_settings()["system"]["log_level"])
+    if app_logger.level > logging.DEBUG:
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(max(logging.WARNING, app_logger.level))
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
@@ -4,6 +4,7 @@ Este módulo contiene todas las configuraciones y constantes utilizadas en la ap
 """
 
 import os
+from functools import lru_cache
 from typing import Any, Dict, Optional
 
 from dotenv import load_dotenv
@@ -22,6 +23,8 @@ APIs = {
     "anthropic": {
         "api_key": os.getenv("ANTHROPIC_API_KEY"),
         "model": os.getenv("ANTHROPIC_MODEL", "claude-3-5-haiku-20241022"),
+        # Modelo económico para mensajes cortos (por ejemplo, en el agente legal)
+        "fast_model": os.getenv("ANTHROPIC_FAST_MODEL", "claude-3-5-haiku-20241022"),
         "temperature": float(os.getenv("ANTHROPIC_TEMPERATURE", "0.3")),
         "max_tokens": int(os.getenv("ANTHROPIC_MAX_TOKENS", "4096")),
     },
@@ -37,9 +40,29 @@ SYSTEM = {
     "debug": os.getenv("DEBUG", "True").lower() == "true",
     "log_level": os.getenv("LOG_LEVEL", "INFO"),
     "max_history_length": int(os.getenv("MAX_HISTORY_LENGTH", "10")),
+    "max_messages": int(os.getenv("MAX_MESSAGES", "64")),
     "user_data_expiry_days": int(os.getenv("USER_DATA_EXPIRY_DAYS", "30")),
 }
 
+# Configuración de caché de respuestas del LLM
+CACHE = {
+    # Cachea respuestas aunque la temperatura del modelo sea mayor a 0
+    "llm_responses": os.getenv("LLM_CACHE_ENABLED", "False").lower() == "true",
+    "max_size": int(os.getenv("LLM_CACHE_MAX_SIZE", "1024")),
+    # Caché semántica (requiere sentence-transformers; faiss es opcional)
+    "semantic": os.getenv("SEMANTIC_CACHE_ENABLED", "False").lower() == "true",
+    "semantic_threshold": float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+    "embedding_model": os.getenv(
+        "SEMANTIC_CACHE_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
+    ),
+}
+
+# Ruteo semántico local del supervisor (usa el mismo modelo de embeddings que la caché)
+ROUTING = {
+    "semantic": os.getenv("SEMANTIC_ROUTER_ENABLED", "False").lower() == "true",
+    "semantic_threshold": float(os.getenv("SEMANTIC_ROUTER_THRESHOLD", "0.62")),
+}
+
 # Configuración legal
 LEGAL = {
     "consent_message": "Para ayudarte mejor, necesito tu autorización para procesar tus datos personales según la Ley 29733 de Protección de Datos Personales de Perú. ¿Me autorizas?",
@@ -71,15 +94,20 @@ LEAD_PRIORITIES = {
 }
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> Dict[str, Any]:
     """Obtiene las configuraciones consolidadas en un solo diccionario.
 
+    El diccionario se construye una sola vez y se comparte en todo el proceso.
+
     Returns:
         Diccionario con todas las configuraciones
     """
     return {
         "apis": APIs,
         "system": SYSTEM,
+        "cache": CACHE,
+        "routing": ROUTING,
         "legal": LEGAL,
         "agent_prompts": AGENT_PROMPTS,
         "agent_names": AGENT_NAMES,
@@ -4,12 +4,15 @@ Este módulo define un grafo de conversación que utiliza un supervisor para orq
 múltiples agentes especializados, permitiendo una recolección no secuencial de datos.
 """
 
+import logging
 import os
-from typing import Dict, Any, Optional
+from functools import lru_cache
+from typing import Dict, Any, Optional, cast
 
 from langchain.globals import set_debug
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import StateGraph, START, END
+from langgraph.graph.state import CompiledStateGraph
 
 from src.agents.collector_agent import CollectorAgent
 from src.agents.legal_agent import LegalAgent
@@ -18,6 +21,7 @@ from src.agents.preferences_agent import PreferencesAgent
 from src.agents.supervisor_agent import SupervisorAgent
 from src.config.settings import get_settings
 from src.models.agent_state import AgentState, get_initial_state
+from src.services.conversation_memory import compact_history
 from src.services.lead_repository import save_lead_data
 from src.services.analytics_client import track_agent_assignment, track_lead_update
 
@@ -25,31 +29,49 @@ from src.services.analytics_client import track_agent_assignment, track_lead_upd
 if os.getenv("DEBUG", "False").lower() == "true":
     set_debug(True)
 
+logger = logging.getLogger(__name__)
+
 # Obtener configuración
 settings = get_settings()
 
+# Valores de configuración usados en cada turno, resueltos una sola vez al importar
+_MODEL = settings["apis"]["anthropic"]["model"]
+_FAST_MODEL = settings["apis"]["anthropic"]["fast_model"]
+_WELCOME = settings["agent_prompts"]["welcome"]
+
 
-def create_inmobilia_graph():
+@lru_cache(maxsize=1)
+def create_inmobilia_graph() -> CompiledStateGraph[AgentState, None, AgentState, AgentState]:
     """Crea el grafo de conversación no secuencial para Inmobilia AI.
 
     Este grafo implementa un enfoque dinámico donde el supervisor analiza
     cada mensaje y determina qué agente debe manejarlo, sin un flujo secuencial.
+    Se construye una sola vez por proceso, la primera vez que se necesita, de modo
+    que importar el módulo no instancia los agentes.
 
     Returns:
         Grafo compilado listo para ser ejecutado
     """
     # Instanciar agentes
-    supervisor = SupervisorAgent(model_name=settings["apis"]["anthropic"]["model"])
-    legal_agent = LegalAgent(model_name=settings["apis"]["anthropic"]["model"])
-    collector_agent = CollectorAgent(model_name=settings["apis"]["anthropic"]["model"])
-    location_agent = LocationAgent(model_name=settings["apis"]["anthropic"]["model"])
-    preferences_agent = PreferencesAgent(model_name=settings["apis"]["anthropic"]["model"])
+    supervisor = SupervisorAgent(model_name=_MODEL)
+    legal_agent = LegalAgent(
+        model_name=_MODEL,
+        fast_model_name=_FAST_MODEL,
+    )
+    collector_agent = CollectorAgent(model_name=_MODEL)
+    location_agent = LocationAgent(model_name=_MODEL)
+    preferences_agent = PreferencesAgent(model_name=_MODEL)
 
     # Definir el grafo con el estado
     workflow = StateGraph(AgentState)
 
-    # Añadir nodos para cada agente
-    workflow.add_node("supervisor", supervisor.router_node)
+    # Añadir nodos para cada agente. El supervisor rutea con Command, que puede
+    # enviar un mismo mensaje a varios agentes especializados en paralelo
+    workflow.add_node(
+        "supervisor",
+        supervisor.router_node,
+        destinations=("legal", "collector", "location", "preferences", END),
+    )
     workflow.add_node("legal", legal_agent.process_node)
     workflow.add_node("collector", collector_agent.process_node)
     workflow.add_node("location", location_agent.process_node)
@@ -58,19 +80,6 @@ def create_inmobilia_graph():
     # Establecer el punto de entrada
     workflow.add_edge(START, "supervisor")
 
-    # Todas las decisiones de enrutamiento se toman en el supervisor
-    workflow.add_conditional_edges(
-        "supervisor",
-        supervisor.decide_next_agent,
-        {
-            "legal": "legal",
-            "collector": "collector",
-            "location": "location",
-            "preferences": "preferences",
-            END: END,
-        }
-    )
-
     # Todos los agentes vuelven al supervisor después de procesar
     for agent_name in ["legal", "collector", "location", "preferences"]:
         workflow.add_edge(agent_name, "supervisor")
@@ -78,8 +87,20 @@ def create_inmobilia_graph():
     return workflow.compile(checkpointer=MemorySaver())
 
 
-# Instanciar el grafo
-graph = create_inmobilia_graph()
+def get_graph() -> CompiledStateGraph[AgentState, None, AgentState, AgentState]:
+    """Obtiene el grafo compartido, creándolo en la primera llamada.
+
+    Returns:
+        Grafo compilado listo para ser ejecutado
+    """
+    return create_inmobilia_graph()
+
+
+def __getattr__(name: str) -> CompiledStateGraph[AgentState, None, AgentState, AgentState]:
+    """Mantiene `inmobilia_graph.graph` disponible sin construirlo al importar."""
+    if name == "graph":
+        return get_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 async def process_message(
@@ -101,24 +122,49 @@ async def process_message(
     Returns:
         Estado actualizado después de procesar el mensaje
     """
-    # Inicializar estado si es la primera vez
-    if not state:
-        state = get_initial_state(message, session_id, user_id)
-    else:
-        # Actualizar estado con el mensaje actual
-        state["current_message"] = message
-        state["messages"].append({"role": "user", "content": message})
+    graph = get_graph()
 
-    try:
-        # Configuración para el grafo
-        config = {
-            "thread_id": session_id,
-            "user_id": user_id or session_id,
-            "timestamp": state.get("conversation_start_time")
-        }
+    # Configuración para el grafo
+    config = {
+        "thread_id": session_id,
+        "user_id": user_id or session_id,
+    }
 
-        # Procesar el mensaje a través del grafo
-        result = await graph.ainvoke(state, {"configurable": config})
+    try:
+        # Inicializar estado si es la primera vez
+        if not state:
+            state = get_initial_state(message, session_id, user_id)
+            graph_input = state
+        else:
+            user_message = {"role": "user", "content": message}
+            state["current_message"] = message
+
+            # Si el checkpointer ya conserva la conversación, enviar solo el nuevo
+            # mensaje: el reducer de `messages` lo añade al historial existente
+            checkpoint = await graph.aget_state({"configurable": config})
+            if checkpoint.values:
+                graph_input = {"current_message": message, "messages": [user_message]}
+            else:
+                state["messages"].append(user_message)
+                graph_input = state
+
+        config["timestamp"] = state.get("conversation_start_time")
+
+        # Procesar el mensaje a través del grafo. El checkpoint se guarda una sola vez al
+        # terminar el turno en lugar de serializar el estado tras cada superetapa
+        result = await graph.ainvoke(
+            cast(AgentState, graph_input), {"configurable": config}, durability="exit"
+        )
+
+        # Mantener acotado el historial: los mensajes antiguos se reemplazan por un resumen
+        compacted = await compact_history(result)
+        if compacted:
+            await graph.aupdate_state({"configurable": config}, compacted, as_node="supervisor")
+            result = {
+                **result,
+                "messages": compacted["messages"].value,
+                "context": compacted["context"],
+            }
 
         # Registrar qué agente manejó el mensaje para analíticas
         if "current_agent" in result and result["current_agent"] != state.get("last_agent"):
@@ -133,19 +179,21 @@ async def process_message(
 
         # Guardar datos del lead si existen
         if "lead_obj" in result and result["lead_obj"]:
-            save_lead_data(session_id, result["lead_obj"])
+            # Se serializa una sola vez para guardar y registrar el lead
+            lead_dict = result["lead_obj"].to_dict()
+            save_lead_data(session_id, lead_dict)
 
             # Registrar actualización del lead
             track_lead_update(
                 thread_id=session_id,
-                lead_data=result["lead_obj"].to_dict(),
+                lead_data=lead_dict,
                 source=result.get("current_agent", "system")
             )
 
         return result
     except Exception as e:
         # Manejo de errores
-        print(f"Error procesando mensaje: {str(e)}")
+        logger.exception("Error procesando mensaje", extra={"session_id": session_id})
         state["error"] = str(e)
         return state
 
@@ -160,7 +208,7 @@ async def start_conversation(session_id: str, user_id: Optional[str] = None) ->
     Returns:
         Estado inicial de la conversación
     """
-    welcome_message = settings["agent_prompts"]["welcome"]
+    welcome_message = _WELCOME
 
     # Crear estado inicial
     initial_state = get_initial_state("", session_id, user_id)
@@ -1,13 +1,20 @@
 """Definición del estado para el grafo del agente conversacional."""
 
+import operator
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, List, Literal, Optional, TypedDict, Union
+from typing import Any, Dict, List, Literal, Optional, TypedDict
 
 from typing_extensions import Annotated
 
+from src.config.settings import get_settings
+
 from .lead_data import LeadData
 
+# Máximo de mensajes que conserva el estado. El historial normalmente se compacta
+# antes con un resumen; este tope solo evita que crezca sin límite si eso falla
+MAX_MESSAGES = get_settings()["system"]["max_messages"]
+
 
 class AgentNode(str, Enum):
     """Nodos principales del grafo conversacional."""
@@ -29,15 +36,46 @@ class Message(TypedDict):
     name: Optional[str]
 
 
+def append_messages(current: List[Message], update: List[Message]) -> List[Message]:
+    """Añade los mensajes nuevos al historial en una lista nueva.
+
+    La lista del canal no se modifica: la comparten las entradas de los nodos, los
+    resultados anteriores y las instantáneas del checkpoint. Si se supera
+    MAX_MESSAGES se descartan los mensajes más antiguos.
+    """
+    return ((current or []) + (update or []))[-MAX_MESSAGES:]
+
+
+def merge_lead_data(current: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Combina los datos del lead escritos por agentes que corren en paralelo."""
+    return {**(current or {}), **(update or {})}
+
+
+def lead_data_changes(current: Dict[str, Any], updated: Dict[str, Any]) -> Dict[str, Any]:
+    """Obtiene los campos del lead que un agente agregó o modificó.
+
+    Los agentes devuelven solo estos campos: si devolvieran todos sus datos, en una
+    superetapa en paralelo la copia desactualizada de una rama podría pisar los
+    campos que escribió la otra.
+    """
+    return {key: value for key, value in updated.items() if current.get(key) != value}
+
+
+def keep_latest(current: Any, update: Any) -> Any:
+    """Conserva el último valor escrito, ignorando las escrituras vacías."""
+    return current if update is None else update
+
+
 class AgentState(TypedDict, total=False):
     """Estado compartido a través del grafo de conversación."""
 
-    # Información del lead
-    lead_data: Dict[str, Any]
-    lead_obj: Optional[LeadData]
+    # Información del lead. Varios agentes pueden escribirla en la misma superetapa
+    lead_data: Annotated[Dict[str, Any], merge_lead_data]
+    lead_obj: Annotated[Optional[LeadData], keep_latest]
     # Estado de la conversación
     conversation_history: List[Dict[str, str]]
-    messages: List[Union[Message, Annotated[List[str], lambda x, y: x + y]]]
+    # Los nodos devuelven solo los mensajes nuevos; el reducer los añade al historial
+    messages: Annotated[List[Message], append_messages]
     current_message: str
     last_agent: str
     last_response: str
@@ -46,7 +84,8 @@ class AgentState(TypedDict, total=False):
     session_id: str
     user_id: str
     conversation_start_time: str
-    routing_decisions: List[Dict[str, Any]]
+    # El supervisor devuelve solo la nueva decisión; el reducer la concatena
+    routing_decisions: Annotated[List[Dict[str, Any]], operator.add]
     error: Optional[str]
     # Preferencias y propiedades
     property_matches: List[Dict[str, Any]]
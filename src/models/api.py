@@ -3,7 +3,7 @@
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 from .lead_data import LeadData
 
@@ -11,6 +11,9 @@ from .lead_data import LeadData
 class ChatRequest(BaseModel):
     """Solicitud de chat."""
 
+    # Inmutable y sin campos desconocidos: se valida una vez al entrar a la API
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     message: str = Field(..., description="Mensaje del usuario")
     session_id: Optional[str] = Field(
         None, description="ID de sesión existente, si continúa una conversación"
@@ -38,6 +41,9 @@ class LeadDataResponse(LeadData):
 class ChatResponse(BaseModel):
     """Respuesta de chat."""
 
+    # Inmutable y sin campos desconocidos: se construye una vez y solo se serializa
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     message: str = Field(..., description="Respuesta del asistente")
     session_id: str = Field(..., description="ID de la sesión")
     user_id: Optional[str] = Field(None, description="ID del usuario")
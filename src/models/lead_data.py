@@ -7,7 +7,21 @@ con validaciones y utilitarios para gestionar la información del cliente.
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Union
 
-from pydantic import BaseModel, Field, field_validator, model_validator
+from pydantic import BaseModel, Field, PrivateAttr, field_validator, model_validator
+
+# Campos del lead por nivel de prioridad, compartidos por todas las instancias
+P10_FIELDS = ("nombre", "tipo_inmueble", "consentimiento")  # Obligatorios
+P9_FIELDS = ("celular", "email", "distrito", "metraje")  # Importantes
+P8_FIELDS = ("habitaciones", "presupuesto_min", "presupuesto_max")  # Adicionales
+P7_FIELDS = ("tipo_documento", "numero_documento", "timeline_compra")  # Opcionales
+
+# Campos revisados por get_missing_fields según el nivel de prioridad pedido
+_MISSING_FIELDS_BY_PRIORITY = {
+    10: P10_FIELDS + P9_FIELDS + P8_FIELDS + P7_FIELDS,
+    9: P9_FIELDS + P8_FIELDS + P7_FIELDS,
+    8: P8_FIELDS + P7_FIELDS,
+    7: P7_FIELDS,
+}
 
 
 class LeadMetadata(BaseModel):
@@ -64,6 +78,16 @@ class LeadData(BaseModel):
         "extra": "ignore",  # Ignorar campos adicionales
     }
 
+    # Versión de los datos; cambia con cada modificación e invalida el dict cacheado
+    _version: int = PrivateAttr(default=0)
+    _cached_dict: Optional[Dict[str, Any]] = PrivateAttr(default=None)
+    _cached_version: int = PrivateAttr(default=-1)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if not name.startswith("_"):
+            self._version += 1
+
     # Validadores de campos
     @field_validator("metraje")
     @classmethod
@@ -125,17 +149,16 @@ class LeadData(BaseModel):
     # Métodos de utilidad
     def update_estado(self) -> None:
         """Actualiza el estado del lead basado en los datos completados."""
+        values = self.__dict__
+
         # Campos obligatorios (P10)
-        p10_fields = ["nombre", "tipo_inmueble", "consentimiento"]
-        p10_missing = [field for field in p10_fields if getattr(self, field) is None]
+        p10_missing = any(values[field] is None for field in P10_FIELDS)
 
         # Campos importantes (P9)
-        p9_fields = ["celular", "email", "distrito", "metraje"]
-        p9_completed = len([field for field in p9_fields if getattr(self, field) is not None])
+        p9_completed = sum(values[field] is not None for field in P9_FIELDS)
 
         # Campos adicionales (P8)
-        p8_fields = ["habitaciones", "presupuesto_min", "presupuesto_max"]
-        p8_completed = len([field for field in p8_fields if getattr(self, field) is not None])
+        p8_completed = sum(values[field] is not None for field in P8_FIELDS)
 
         if p10_missing:
             self.estado = "ConversacionIniciada"
@@ -149,6 +172,17 @@ class LeadData(BaseModel):
         # Actualizar fecha de modificación
         if self.metadata:
             self.metadata.fecha_modificacion = datetime.now().isoformat()
+            self._version += 1
+
+    def mark_interaction(self, timestamp: str) -> None:
+        """Registra la fecha de la última interacción con el lead.
+
+        Args:
+            timestamp: Fecha de la interacción en formato ISO
+        """
+        if self.metadata:
+            self.metadata.ultima_interaccion = timestamp
+            self._version += 1
 
     def is_core_complete(self) -> bool:
         """Verifica si los datos obligatorios (P10) están completos."""
@@ -173,35 +207,47 @@ class LeadData(BaseModel):
         Returns:
             Lista de nombres de campos faltantes
         """
-        missing = []
-
-        if priority >= 10:  # Obligatorios
-            p10_fields = ["nombre", "tipo_inmueble", "consentimiento"]
-            missing.extend([f for f in p10_fields if getattr(self, f) is None])
+        if priority >= 10:
+            fields = _MISSING_FIELDS_BY_PRIORITY[10]
+        elif priority < 7:
+            return []
+        else:
+            fields = _MISSING_FIELDS_BY_PRIORITY[priority]
 
-        if priority >= 9:  # Importantes
-            p9_fields = ["celular", "email", "distrito", "metraje"]
-            missing.extend([f for f in p9_fields if getattr(self, f) is None])
+        values = self.__dict__
+        return [field for field in fields if values[field] is None]
 
-        if priority >= 8:  # Adicionales
-            p8_fields = ["habitaciones", "presupuesto_min", "presupuesto_max"]
-            missing.extend([f for f in p8_fields if getattr(self, f) is None])
+    def to_dict(self) -> Dict[str, Any]:
+        """Convierte el objeto a un diccionario, excluyendo campos nulos.
 
-        if priority >= 7:  # Opcionales
-            p7_fields = ["tipo_documento", "numero_documento", "timeline_compra"]
-            missing.extend([f for f in p7_fields if getattr(self, f) is None])
+        El resultado se reutiliza mientras el lead no cambie, así que no debe modificarse.
+        """
+        if self._cached_dict is None or self._cached_version != self._version:
+            self._cached_dict = self.model_dump(exclude_none=True)
+            self._cached_version = self._version
+        return self._cached_dict
 
-        return missing
+    def update_from_dict(self, data: Dict[str, Any], validate: bool = True) -> None:
+        """Actualiza los campos del lead desde un diccionario.
 
-    def to_dict(self) -> Dict[str, Any]:
-        """Convierte el objeto a un diccionario, excluyendo campos nulos."""
-        return self.model_dump(exclude_none=True)
-
-    def update_from_dict(self, data: Dict[str, Any]) -> None:
-        """Actualiza los campos del lead desde un diccionario."""
-        for key, value in data.items():
-            if value is not None and hasattr(self, key):
-                setattr(self, key, value)
+        Args:
+            data: Campos a actualizar; los valores None se ignoran
+            validate: Si es False, asigna los valores sin pasar por los validadores de
+                Pydantic. Solo debe usarse con datos ya tipados (por ejemplo, la salida
+                estructurada del LLM); el rango de presupuesto se sigue corrigiendo.
+        """
+        if validate:
+            for key, value in data.items():
+                if value is not None and hasattr(self, key):
+                    setattr(self, key, value)
+        else:
+            fields = type(self).model_fields
+            for key, value in data.items():
+                if value is not None and key in fields:
+                    self.__dict__[key] = value
+                    self.__pydantic_fields_set__.add(key)
+            self._version += 1
+            self.check_presupuesto_range()
 
         # Actualizar estado y metadata
         self.update_estado()
@@ -4,11 +4,17 @@ Este módulo proporciona funciones para enviar datos analíticos
 a servicios externos para monitoreo y análisis.
 """
 
-import json
+import asyncio
+import logging
 import os
-import traceback
+import threading
+from collections import defaultdict
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
 
 # Directorio para almacenar analíticas (para desarrollo)
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data")
@@ -17,13 +23,31 @@ ANALYTICS_DIR = os.path.join(DATA_DIR, "analytics")
 # Asegurar que los directorios existen
 os.makedirs(ANALYTICS_DIR, exist_ok=True)
 
+# Cada escritura lee, modifica y reescribe el archivo de la conversación; el lock evita
+# que el escritor en segundo plano y `track_conversation` se pisen entre sí
+_write_lock = threading.Lock()
+
+
+def truncate(text: str, limit: int) -> str:
+    """Recorta un texto para logs y analíticas; solo copia si supera el límite.
+
+    Args:
+        text: Texto a recortar
+        limit: Número máximo de caracteres que se conservan
+
+    Returns:
+        El texto original, o sus primeros `limit` caracteres seguidos de "..."
+    """
+    return text if len(text) <= limit else f"{text[:limit]}..."
+
 
 def track_conversation(thread_id: str, event_type: str, event_data: Dict[str, Any]) -> bool:
     """Registra un evento de conversación para analíticas.
 
     En un entorno de producción, esto enviaría datos a un sistema analítico como
     Google Analytics, Segment, o un data warehouse interno. Para desarrollo,
-    guarda los eventos en archivos JSON locales.
+    guarda los eventos en archivos JSON locales. Dentro de un event loop el evento
+    se encola en `analytics_batcher`, que lo escribe en segundo plano.
 
     Args:
         thread_id: Identificador único de la conversación
@@ -31,41 +55,157 @@ def track_conversation(thread_id: str, event_type: str, event_data: Dict[str, An
         event_data: Datos adicionales del evento
 
     Returns:
-        Boolean indicando si la operación fue exitosa
+        Boolean indicando si el evento se registró o se encoló
     """
     try:
-        # Estructura del evento
-        event = {
-            "thread_id": thread_id,
-            "event_type": event_type,
-            "timestamp": datetime.now().isoformat(),
-            "data": event_data,
-        }
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        analytics_batcher.enqueue(thread_id, event_type, event_data)
+        return True
 
-        # Crear archivo para el thread si no existe
-        thread_analytics_file = os.path.join(ANALYTICS_DIR, f"{thread_id}_events.json")
+    try:
+        _write_events([_build_event(thread_id, event_type, event_data)])
+        return True
+    except Exception:
+        logger.exception("Error al registrar evento analítico")
+        return False
 
-        # Cargar eventos existentes o crear una lista nueva
-        if os.path.exists(thread_analytics_file):
-            with open(thread_analytics_file, "r", encoding="utf-8") as f:
-                events = json.load(f)
-            if not isinstance(events, list):
-                events = []
-        else:
-            events = []
 
-        # Añadir nuevo evento
-        events.append(event)
+def _build_event(thread_id: str, event_type: str, event_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Construye la estructura de un evento analítico."""
+    return {
+        "thread_id": thread_id,
+        "event_type": event_type,
+        # orjson serializa datetime directamente en formato ISO 8601
+        "timestamp": datetime.now(),
+        "data": event_data,
+    }
 
-        # Guardar eventos actualizados
-        with open(thread_analytics_file, "w", encoding="utf-8") as f:
-            json.dump(events, f, ensure_ascii=False, indent=2)
 
-        return True
-    except Exception as e:
-        print(f"Error al registrar evento analítico: {e}")
-        traceback.print_exc()
-        return False
+def _write_events(events: List[Dict[str, Any]]) -> None:
+    """Persiste un lote de eventos con una sola escritura por conversación.
+
+    Args:
+        events: Eventos a guardar, posiblemente de distintas conversaciones
+    """
+    events_by_thread: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for event in events:
+        events_by_thread[event["thread_id"]].append(event)
+
+    with _write_lock:
+        for thread_id, new_events in events_by_thread.items():
+            # Crear archivo para el thread si no existe
+            thread_analytics_file = os.path.join(ANALYTICS_DIR, f"{thread_id}_events.json")
+
+            # Cargar eventos existentes o crear una lista nueva
+            if os.path.exists(thread_analytics_file):
+                with open(thread_analytics_file, "rb") as f:
+                    stored_events = orjson.loads(f.read())
+                if not isinstance(stored_events, list):
+                    stored_events = []
+            else:
+                stored_events = []
+
+            # Añadir nuevos eventos
+            stored_events.extend(new_events)
+
+            # Guardar en un archivo temporal y reemplazar el original, para que una
+            # escritura interrumpida no deje el archivo a medias
+            tmp_file = f"{thread_analytics_file}.tmp"
+            with open(tmp_file, "wb") as f:
+                f.write(orjson.dumps(stored_events, option=orjson.OPT_INDENT_2))
+            os.replace(tmp_file, thread_analytics_file)
+
+
+class AnalyticsBatcher:
+    """Acumula eventos analíticos y los persiste en lotes en segundo plano.
+
+    Evita que el registro de eventos agregue latencia al turno de conversación:
+    `enqueue` retorna inmediatamente y una tarea en segundo plano escribe los
+    eventos cuando se acumulan `max_batch_size` o pasa `flush_interval` sin nuevos eventos.
+    """
+
+    def __init__(
+        self, max_batch_size: int = 32, flush_interval: float = 0.25, max_queue_size: int = 10000
+    ):
+        """Inicializa el acumulador.
+
+        Args:
+            max_batch_size: Número máximo de eventos por lote
+            flush_interval: Segundos de espera por nuevos eventos antes de escribir el lote
+            max_queue_size: Eventos pendientes máximos; al superarlo los nuevos se descartan
+        """
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.dropped_events = 0
+        # Cola y tarea del event loop en uso; se crean la primera vez que se encola
+        # un evento y se vuelven a crear si cambia el loop
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue[Dict[str, Any]]] = None
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def enqueue(self, thread_id: str, event_type: str, event_data: Dict[str, Any]) -> None:
+        """Encola un evento de conversación sin bloquear.
+
+        Debe llamarse desde un event loop en ejecución.
+
+        Args:
+            thread_id: Identificador único de la conversación
+            event_type: Tipo de evento (por ejemplo, "message_sent", "lead_created")
+            event_data: Datos adicionales del evento
+        """
+        queue = self._get_queue()
+        try:
+            queue.put_nowait(_build_event(thread_id, event_type, event_data))
+        except asyncio.QueueFull:
+            # Si el almacenamiento no da abasto, se pierde el evento antes que frenar el turno
+            self.dropped_events += 1
+            logger.warning("Cola de analíticas llena, evento descartado: %s", event_type)
+
+    async def flush(self) -> None:
+        """Espera a que todos los eventos encolados se hayan persistido."""
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+
+    def _get_queue(self) -> asyncio.Queue[Dict[str, Any]]:
+        """Obtiene la cola del event loop actual, creándola junto con su tarea si hace falta."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._queue is None:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run(self._queue))
+        return self._queue
+
+    async def _run(self, queue: asyncio.Queue[Dict[str, Any]]) -> None:
+        """Consume la cola y escribe los eventos por lotes.
+
+        Args:
+            queue: Cola del event loop en el que corre la tarea
+        """
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), self.flush_interval))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await asyncio.to_thread(_write_events, batch)
+            except Exception:
+                logger.exception("Error al registrar lote de eventos analíticos")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+
+# Acumulador compartido de eventos analíticos
+analytics_batcher = AnalyticsBatcher()
 
 
 def track_agent_assignment(thread_id: str, user_message: str, assigned_agent: str) -> bool:
@@ -83,9 +223,7 @@ def track_agent_assignment(thread_id: str, user_message: str, assigned_agent: st
         thread_id=thread_id,
         event_type="agent_assignment",
         event_data={
-            "user_message": (
-                user_message[:100] + "..." if len(user_message) > 100 else user_message
-            ),
+            "user_message": truncate(user_message, 100),
             "assigned_agent": assigned_agent,
         },
     )
@@ -138,8 +276,8 @@ def get_conversation_events(thread_id: str) -> Optional[Dict[str, Any]]:
         if not os.path.exists(thread_analytics_file):
             return None
 
-        with open(thread_analytics_file, "r", encoding="utf-8") as f:
-            events = json.load(f)
+        with open(thread_analytics_file, "rb") as f:
+            events = orjson.loads(f.read())
 
         # Calcular algunas métricas básicas
         agent_assignments = {}
@@ -159,6 +297,6 @@ def get_conversation_events(thread_id: str) -> Optional[Dict[str, Any]]:
             "lead_updates": lead_updates,
             "events": events,
         }
-    except Exception as e:
-        print(f"Error al recuperar eventos de conversación: {e}")
+    except Exception:
+        logger.exception("Error al recuperar eventos de conversación")
         return None
@@ -0,0 +1,146 @@
+"""Memoria acotada de la conversación: ventana de mensajes recientes más un resumen.
+
+El reducer de `messages` concatena los mensajes de cada turno, así que sin límite
+el historial (y el estado que el checkpointer serializa) crece con cada turno.
+Cuando el historial duplica la ventana configurada, los mensajes más antiguos se
+resumen con el modelo económico y se reemplazan por ese resumen en el contexto.
+"""
+
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Sequence, TypedDict
+
+from langgraph.types import Overwrite
+
+from src.config.settings import get_settings
+from src.services.llm_client import create_chat_model, provider_slot
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Mensajes recientes que se conservan completos tras compactar el historial
+HISTORY_WINDOW = settings["system"]["max_history_length"]
+
+# Longitud del historial a partir de la cual se resumen los mensajes antiguos.
+# Compactar solo al duplicar la ventana evita una llamada al modelo en cada turno
+HISTORY_COMPACT_THRESHOLD = 2 * HISTORY_WINDOW
+
+# Mensajes de la sesión que los agentes incluyen como historial en su prompt
+PROMPT_HISTORY_WINDOW = 6
+
+_ROLE_PREFIX = {"user": "Usuario", "assistant": "Asistente", "system": "Sistema"}
+
+
+class CompactedHistory(TypedDict):
+    """Actualización de estado que reemplaza el historial por su versión compactada."""
+
+    messages: Overwrite
+    context: Dict[str, Any]
+
+
+SUMMARY_PROMPT = """
+Resume la siguiente conversación entre un asesor inmobiliario y un usuario en
+máximo 5 líneas, en español. Conserva los datos que el usuario ya proporcionó,
+sus preferencias y las preguntas pendientes. Si hay un resumen previo, intégralo.
+
+Resumen previo:
+{previous_summary}
+
+Conversación:
+{conversation}
+"""
+
+
+def _format_messages(messages: List[Dict[str, Any]]) -> str:
+    """Formatea los mensajes como texto plano para el prompt de resumen."""
+    return "\n".join(
+        f"{_ROLE_PREFIX.get(msg.get('role', ''), 'Asistente')}: {msg.get('content', '')}"
+        for msg in messages
+    )
+
+
+def format_history(messages: Sequence[Mapping[str, Any]]) -> str:
+    """Formatea los últimos mensajes de la sesión para el prompt de un agente.
+
+    Los agentes se comparten entre todas las sesiones, así que el historial se toma
+    siempre de los mensajes del estado de la conversación y nunca del agente. Si el
+    último mensaje es del usuario se omite: es el mensaje actual, que el agente ya
+    envía como entrada del prompt.
+
+    Args:
+        messages: Mensajes de la sesión
+
+    Returns:
+        Historial formateado, con un mensaje por párrafo
+    """
+    if messages and messages[-1].get("role") == "user":
+        messages = messages[:-1]
+    return "".join(
+        f"{_ROLE_PREFIX.get(msg.get('role', ''), 'Asistente')}: {msg.get('content', '')}\n\n"
+        for msg in messages[-PROMPT_HISTORY_WINDOW:]
+    )
+
+
+def is_first_turn(messages: Sequence[Mapping[str, Any]]) -> bool:
+    """Indica si el asistente todavía no respondió en la sesión.
+
+    Un mensaje breve ("sí", "ok") significa algo distinto según la conversación, así
+    que la caché semántica de los agentes, que solo compara el mensaje y los datos
+    del lead, se limita al primer turno.
+
+    Args:
+        messages: Mensajes de la sesión
+
+    Returns:
+        True si no hay respuestas del asistente en el historial
+    """
+    return not any(msg.get("role") == "assistant" for msg in messages)
+
+
+async def summarize_messages(messages: List[Dict[str, Any]], previous_summary: str = "") -> str:
+    """Resume un tramo de la conversación con el modelo económico.
+
+    Args:
+        messages: Mensajes a resumir
+        previous_summary: Resumen acumulado de los tramos anteriores
+
+    Returns:
+        Nuevo resumen que integra el anterior
+    """
+    model = create_chat_model(settings["apis"]["anthropic"]["fast_model"], 0.0)
+    async with provider_slot(model):
+        response = await model.ainvoke(
+            SUMMARY_PROMPT.format(
+                previous_summary=previous_summary or "Sin resumen previo.",
+                conversation=_format_messages(messages),
+            )
+        )
+    summary = response.content
+    return summary if isinstance(summary, str) else str(summary)
+
+
+async def compact_history(state: Dict[str, Any]) -> Optional[CompactedHistory]:
+    """Resume los mensajes antiguos si el historial superó el umbral.
+
+    Args:
+        state: Estado de la conversación al terminar el turno
+
+    Returns:
+        Actualización de estado con la ventana de mensajes recientes y el resumen
+        en `context["summary"]`, o None si no hace falta compactar
+    """
+    messages = state.get("messages") or []
+    if len(messages) <= HISTORY_COMPACT_THRESHOLD:
+        return None
+
+    older, recent = messages[:-HISTORY_WINDOW], messages[-HISTORY_WINDOW:]
+    context = dict(state.get("context") or {})
+    try:
+        context["summary"] = await summarize_messages(older, context.get("summary", ""))
+    except Exception as e:
+        # Sin resumen se conserva el historial completo y se reintenta el próximo turno
+        logger.error(f"Error al resumir el historial: {e}")
+        return None
+
+    # Overwrite reemplaza el historial en lugar de pasar por el reducer de concatenación
+    return {"messages": Overwrite(recent), "context": context}
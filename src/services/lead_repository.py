@@ -36,8 +36,8 @@ def save_lead_data(thread_id: str, lead_data: Union[LeadData, Dict[str, Any]]) -
         # Convertir a diccionario si es un objeto LeadData
         data_dict = lead_data.to_dict() if isinstance(lead_data, LeadData) else lead_data
 
-        # Añadir timestamp de actualización
-        data_dict["last_updated"] = datetime.now().isoformat()
+        # Añadir timestamp de actualización sin modificar el dict recibido
+        data_dict = {**data_dict, "last_updated": datetime.now().isoformat()}
 
         # Guardar en un archivo JSON
         file_path = os.path.join(LEADS_DIR, f"{thread_id}.json")
@@ -0,0 +1,112 @@
+"""Caché en memoria para respuestas del LLM.
+
+Este módulo proporciona una caché LRU de coincidencia exacta que permite
+reutilizar respuestas del modelo para prompts idénticos sin volver a
+invocar al proveedor.
+"""
+
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from typing import Any, Optional
+
+from src.config.settings import get_settings
+
+settings = get_settings()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class LLMCache:
+    """Caché LRU de coincidencia exacta para respuestas del LLM."""
+
+    def __init__(self, max_size: int = 1024):
+        """Inicializa la caché.
+
+        Args:
+            max_size: Número máximo de respuestas almacenadas
+        """
+        self.max_size = max_size
+        self._entries: OrderedDict[str, str] = OrderedDict()
+
+    @staticmethod
+    def cache_key(*parts: Any) -> str:
+        """Genera una clave determinística a partir de los componentes del prompt.
+
+        Args:
+            parts: Componentes que determinan la respuesta (modelo, prompt, mensaje, etc.)
+
+        Returns:
+            Hash SHA-256 de los componentes serializados
+        """
+        serialized = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Obtiene una respuesta cacheada.
+
+        Args:
+            key: Clave generada con `cache_key`
+
+        Returns:
+            Respuesta almacenada, o None si no existe
+        """
+        response = self._entries.get(key)
+        if response is not None:
+            self._entries.move_to_end(key)
+        return response
+
+    def set(self, key: str, response: str) -> None:
+        """Almacena una respuesta, descartando la menos usada si se excede el límite.
+
+        Args:
+            key: Clave generada con `cache_key`
+            response: Respuesta del modelo
+        """
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Elimina todas las respuestas almacenadas."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        """Número de respuestas almacenadas."""
+        return len(self._entries)
+
+
+def normalize_message(text: str) -> str:
+    """Normaliza un mensaje para usarlo como parte de una clave de caché.
+
+    Ignora mayúsculas y espacios repetidos, de modo que "Hola  " y "hola"
+    compartan la misma respuesta.
+
+    Args:
+        text: Mensaje del usuario
+
+    Returns:
+        Mensaje normalizado
+    """
+    return _WHITESPACE_RE.sub(" ", text).strip().casefold()
+
+
+def is_cacheable(temperature: float) -> bool:
+    """Indica si las respuestas de un modelo pueden cachearse.
+
+    Solo se cachean respuestas determinísticas (temperatura 0), salvo que la
+    caché se habilite explícitamente con `LLM_CACHE_ENABLED`.
+
+    Args:
+        temperature: Temperatura del modelo
+
+    Returns:
+        True si las respuestas pueden reutilizarse
+    """
+    return temperature == 0 or settings["cache"]["llm_responses"]
+
+
+# Caché compartida por todos los agentes
+response_cache = LLMCache(max_size=settings["cache"]["max_size"])
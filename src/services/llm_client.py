@@ -0,0 +1,276 @@
+"""Utilidades compartidas para interactuar con los modelos de lenguaje.
+
+Este módulo centraliza la creación de clientes y la construcción de mensajes para
+los proveedores de LLM, de modo que todos los agentes compartan conexiones y
+aprovechen la caché de prompts del proveedor.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import Any, AsyncIterator, Callable, Dict, Literal, Optional, Sequence
+from weakref import WeakKeyDictionary
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import SystemMessage
+from langchain_core.runnables import Runnable
+from langgraph.config import get_stream_writer
+
+from src.services.llm_cache import is_cacheable, response_cache
+from src.services.semantic_cache import get_semantic_cache
+
+# Parámetros del pool de conexiones compartido con los proveedores de LLM
+_HTTP_TIMEOUT = 30.0
+_HTTP_MAX_KEEPALIVE_CONNECTIONS = 100
+
+# Llamadas simultáneas máximas a cada proveedor por event loop; el resto espera su turno
+_MAX_CONCURRENT_REQUESTS = 32
+_provider_semaphores: WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]] = (
+    WeakKeyDictionary()
+)
+
+# Fragmentos de la respuesta acumulados antes de emitirlos al stream del grafo
+_STREAM_FLUSH_CHUNKS = 4
+
+
+def create_chat_model(
+    model_name: str,
+    temperature: float,
+    provider: Optional[Literal["anthropic", "openai"]] = None,
+) -> BaseChatModel:
+    """Obtiene el cliente de chat compartido para un modelo y temperatura.
+
+    Los clientes se crean una sola vez por proceso y se reutilizan entre agentes,
+    de modo que todas las conversaciones comparten el pool de conexiones HTTP.
+    `langchain_anthropic` y `langchain_openai` se importan de forma diferida para
+    que importar los agentes (por ejemplo, en las pruebas) no cargue ambos SDK.
+
+    Args:
+        model_name: Nombre del modelo a utilizar
+        temperature: Temperatura para la generación de texto
+        provider: Proveedor del modelo; si se omite se deduce del nombre del modelo
+
+    Returns:
+        Cliente de chat de LangChain
+    """
+    if provider is None:
+        provider = "anthropic" if "claude" in model_name else "openai"
+    return _get_chat_model(model_name, temperature, provider)
+
+
+@lru_cache(maxsize=None)
+def _get_chat_model(model_name: str, temperature: float, provider: str) -> BaseChatModel:
+    """Crea el cliente de chat; memorizado para compartirlo en todo el proceso."""
+    if provider == "anthropic":
+        from langchain_anthropic import ChatAnthropic
+
+        # langchain_anthropic ya reutiliza un cliente httpx por proceso
+        return ChatAnthropic(
+            model_name=model_name, temperature=temperature, timeout=None, stop=None
+        )
+
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model_name,
+        temperature=temperature,
+        http_async_client=_get_async_http_client(),
+    )
+
+
+@lru_cache(maxsize=1)
+def _get_async_http_client() -> httpx.AsyncClient:
+    """Crea el cliente HTTP asíncrono compartido, con HTTP/2 si `h2` está instalado."""
+    return httpx.AsyncClient(
+        http2=find_spec("h2") is not None,
+        timeout=_HTTP_TIMEOUT,
+        limits=httpx.Limits(max_keepalive_connections=_HTTP_MAX_KEEPALIVE_CONNECTIONS),
+    )
+
+
+def is_anthropic_model(model: Any) -> bool:
+    """Indica si el cliente de chat corresponde a Anthropic.
+
+    Se compara por nombre de clase para no importar `langchain_anthropic`
+    cuando no se utiliza.
+
+    Args:
+        model: Cliente de chat de LangChain
+
+    Returns:
+        True si el cliente es ChatAnthropic
+    """
+    return type(model).__name__ == "ChatAnthropic"
+
+
+def cached_system_message(text: str, model: Any, tail: Optional[str] = None) -> SystemMessage:
+    """Construye el mensaje de sistema estático marcado para caché de prompts.
+
+    Anthropic requiere un bloque con `cache_control` para cachear el prefijo,
+    mientras que OpenAI cachea prefijos idénticos de forma automática. En ambos
+    casos el texto debe ser idéntico entre turnos y preceder a todo contenido dinámico.
+
+    Args:
+        text: Prompt de sistema estático (instrucciones y base de conocimiento)
+        model: Cliente de chat que recibirá el mensaje
+        tail: Instrucciones finales opcionales, enviadas como bloque aparte sin marcar
+
+    Returns:
+        Mensaje de sistema listo para enviarse al modelo
+    """
+    if is_anthropic_model(model):
+        blocks: list[str | dict[Any, Any]] = [
+            {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+        ]
+        if tail:
+            blocks.append({"type": "text", "text": tail})
+        return SystemMessage(content=blocks)
+    return SystemMessage(content=text + tail if tail else text)
+
+
+async def ainvoke_cached(
+    runnable: Runnable[Any, Any],
+    model_input: Any,
+    *,
+    namespace: str,
+    temperature: float,
+    key_parts: Optional[Sequence[Any]],
+    semantic_text: Optional[str] = None,
+) -> str:
+    """Invoca al modelo reutilizando respuestas cacheadas cuando es posible.
+
+    Primero busca una coincidencia exacta (solo si la temperatura lo permite) y
+    luego una respuesta a un mensaje equivalente en la caché semántica del agente.
+    Si ninguna aplica, invoca al modelo y guarda la respuesta en ambas cachés.
+
+    Args:
+        runnable: Modelo o cadena prompt | modelo a invocar
+        model_input: Entrada para `runnable.ainvoke`
+        namespace: Agente que realiza la llamada; separa las entradas de cada agente
+        temperature: Temperatura del modelo
+        key_parts: Componentes que determinan la respuesta (modelo, prompt, mensaje, etc.);
+            si es None no se usa la caché exacta
+        semantic_text: Texto para la búsqueda semántica; si se omite no se usa esa caché
+
+    Returns:
+        Contenido de la respuesta del modelo
+    """
+    # Reutilizar la respuesta si el mismo prompt ya fue respondido
+    cache_key = None
+    if key_parts is not None and is_cacheable(temperature):
+        cache_key = response_cache.cache_key(namespace, *key_parts)
+        cached_response = response_cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response
+
+    # Buscar una respuesta para un mensaje equivalente (si está habilitado)
+    semantic_cache = get_semantic_cache(namespace) if semantic_text is not None else None
+    if semantic_cache is not None and semantic_text is not None:
+        cached_response = await semantic_cache.alookup(semantic_text)
+        if cached_response is not None:
+            return cached_response
+
+    async with provider_slot(runnable):
+        content = await _astream_content(runnable, model_input, namespace)
+
+    if cache_key is not None:
+        response_cache.set(cache_key, content)
+    if semantic_cache is not None and semantic_text is not None:
+        await semantic_cache.aadd(semantic_text, content)
+
+    return content
+
+
+@asynccontextmanager
+async def provider_slot(model: Any) -> AsyncIterator[None]:
+    """Reserva un turno para llamar al proveedor del modelo.
+
+    Todas las llamadas a un modelo deben hacerse dentro de este contexto, incluidas
+    las que usan `bind_tools` o streaming, para que el límite de concurrencia sea real.
+
+    Args:
+        model: Cliente de chat o runnable que lo envuelve (por ejemplo, con herramientas)
+    """
+    async with _get_provider_semaphore(_provider_name(model)):
+        yield
+
+
+def _provider_name(model: Any) -> str:
+    """Obtiene el proveedor del modelo, atravesando los runnables que lo envuelven."""
+    # RunnableBinding (bind_tools) expone `bound`; RunnableSequence (prompt | modelo), `last`
+    while hasattr(model, "bound") or hasattr(model, "last"):
+        model = model.bound if hasattr(model, "bound") else model.last
+    return "anthropic" if is_anthropic_model(model) else "openai"
+
+
+def _get_provider_semaphore(provider: str) -> asyncio.Semaphore:
+    """Obtiene el semáforo que limita las llamadas concurrentes a un proveedor.
+
+    Las conversaciones simultáneas comparten el prefijo cacheado del prompt de
+    sistema, así que enviarlas en paralelo aprovecha el batching continuo del
+    proveedor; el límite evita saturar el pool de conexiones y los rate limits.
+
+    Args:
+        provider: Nombre del proveedor
+
+    Returns:
+        Semáforo del proveedor asociado al event loop en ejecución
+    """
+    semaphores = _provider_semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = semaphores.get(provider)
+    if semaphore is None:
+        semaphore = semaphores[provider] = asyncio.Semaphore(_MAX_CONCURRENT_REQUESTS)
+    return semaphore
+
+
+def _get_stream_writer() -> Optional[Callable[[Any], None]]:
+    """Obtiene el writer del stream personalizado de LangGraph, si hay uno activo.
+
+    Returns:
+        Función para emitir datos al stream, o None fuera de la ejecución de un grafo
+    """
+    try:
+        return get_stream_writer()
+    except (RuntimeError, KeyError):
+        return None
+
+
+async def _astream_content(runnable: Runnable[Any, Any], model_input: Any, namespace: str) -> str:
+    """Genera la respuesta del modelo emitiendo los fragmentos a medida que llegan.
+
+    Dentro de un grafo, los fragmentos se envían al stream `custom` de LangGraph en
+    grupos de `_STREAM_FLUSH_CHUNKS` como `{"agent": ..., "content": ...}`, para que
+    el cliente muestre la respuesta sin esperar a que se complete. Fuera de un grafo
+    se invoca al modelo de forma normal.
+
+    Args:
+        runnable: Modelo o cadena prompt | modelo a invocar
+        model_input: Entrada para el runnable
+        namespace: Agente que genera la respuesta
+
+    Returns:
+        Contenido completo de la respuesta
+    """
+    writer = _get_stream_writer()
+    if writer is None:
+        response = await runnable.ainvoke(model_input)
+        content: str = response.content
+        return content
+
+    parts: list[str] = []
+    pending: list[str] = []
+    async for chunk in runnable.astream(model_input):
+        if not isinstance(chunk.content, str) or not chunk.content:
+            continue
+        parts.append(chunk.content)
+        pending.append(chunk.content)
+        if len(pending) >= _STREAM_FLUSH_CHUNKS:
+            writer({"agent": namespace, "content": "".join(pending)})
+            pending.clear()
+
+    if pending:
+        writer({"agent": namespace, "content": "".join(pending)})
+
+    return "".join(parts)
@@ -0,0 +1,200 @@
+"""Caché semántica para respuestas del LLM.
+
+Este módulo permite reutilizar respuestas del modelo para mensajes que,
+aunque no sean idénticos, son semánticamente equivalentes (por ejemplo,
+"sí, acepto" y "ok, acepto"). Las dependencias de embeddings son opcionales:
+si `sentence-transformers` no está instalado la caché se desactiva sin errores
+y, si `faiss` no está disponible, la búsqueda se realiza con numpy.
+"""
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, TypeAlias
+
+from src.config.settings import get_settings
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy llega con sentence-transformers
+    np = None  # type: ignore[assignment]
+
+try:
+    import faiss  # type: ignore[import-not-found]
+except ImportError:
+    faiss = None
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Embedding normalizado de un texto
+Embedding: TypeAlias = "NDArray[np.float32]"
+
+# Modelo de embeddings compartido, cargado la primera vez que se necesita
+_embedder: Any = None
+_embedder_available = True
+
+
+def embed_text(text: str) -> Optional[Embedding]:
+    """Genera el embedding normalizado de un texto con sentence-transformers.
+
+    Args:
+        text: Texto a codificar
+
+    Returns:
+        Vector numpy normalizado, o None si el modelo no está disponible
+    """
+    global _embedder, _embedder_available
+
+    if not _embedder_available or np is None:
+        return None
+
+    if _embedder is None:
+        try:
+            from sentence_transformers import (  # type: ignore[import-not-found]
+                SentenceTransformer,
+            )
+
+            _embedder = SentenceTransformer(settings["cache"]["embedding_model"])
+        except Exception as e:
+            logger.warning(f"Embeddings desactivados, no se pudo cargar el modelo: {e}")
+            _embedder_available = False
+            return None
+
+    vector: Embedding = _embedder.encode([text], normalize_embeddings=True)[0].astype("float32")
+    return vector
+
+
+class SemanticCache:
+    """Caché de respuestas basada en similitud coseno entre embeddings."""
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        max_size: int = 1024,
+        embed_fn: Optional[Callable[[str], Optional[Embedding]]] = None,
+    ):
+        """Inicializa la caché semántica.
+
+        Args:
+            threshold: Similitud coseno mínima para considerar un acierto
+            max_size: Número máximo de entradas almacenadas
+            embed_fn: Función que devuelve el embedding normalizado de un texto
+        """
+        self.threshold = threshold
+        self.max_size = max_size
+        self._embed = embed_fn or embed_text
+        self._vectors: List[Embedding] = []
+        self._responses: List[str] = []
+        self._index: Any = None
+
+    def lookup(self, text: str) -> Optional[str]:
+        """Busca una respuesta para un texto semánticamente equivalente.
+
+        Args:
+            text: Texto a buscar (prompt dinámico + mensaje del usuario)
+
+        Returns:
+            Respuesta cacheada si supera el umbral de similitud, o None
+        """
+        if not self._responses:
+            return None
+
+        return self._match(self._embed(text))
+
+    async def alookup(self, text: str) -> Optional[str]:
+        """Versión asíncrona de `lookup`: el embedding se calcula fuera del event loop."""
+        if not self._responses:
+            return None
+
+        return self._match(await asyncio.to_thread(self._embed, text))
+
+    def add(self, text: str, response: str) -> None:
+        """Almacena la respuesta asociada a un texto.
+
+        Args:
+            text: Texto que originó la respuesta
+            response: Respuesta del modelo
+        """
+        self._store(self._embed(text), response)
+
+    async def aadd(self, text: str, response: str) -> None:
+        """Versión asíncrona de `add`: el embedding se calcula fuera del event loop."""
+        self._store(await asyncio.to_thread(self._embed, text), response)
+
+    def _match(self, vector: Optional[Embedding]) -> Optional[str]:
+        """Devuelve la respuesta más similar al vector si supera el umbral."""
+        if vector is None or not self._responses:
+            return None
+
+        similarity, position = self._search(vector)
+        if similarity >= self.threshold:
+            return self._responses[position]
+        return None
+
+    def _store(self, vector: Optional[Embedding], response: str) -> None:
+        """Guarda el vector y su respuesta, descartando la entrada más antigua si hace falta."""
+        if vector is None:
+            return
+
+        self._vectors.append(vector)
+        self._responses.append(response)
+
+        if len(self._responses) > self.max_size:
+            # Descartar la entrada más antigua y reconstruir el índice
+            del self._vectors[0]
+            del self._responses[0]
+            self._index = None
+        elif self._index is not None:
+            self._index.add(vector.reshape(1, -1))
+
+    def clear(self) -> None:
+        """Elimina todas las entradas."""
+        self._vectors.clear()
+        self._responses.clear()
+        self._index = None
+
+    def __len__(self) -> int:
+        """Número de entradas almacenadas."""
+        return len(self._responses)
+
+    def _search(self, vector: Embedding) -> tuple[float, int]:
+        """Obtiene la entrada más similar usando faiss si está disponible."""
+        if faiss is None:
+            similarities = np.vstack(self._vectors) @ vector
+            position = int(similarities.argmax())
+            return float(similarities[position]), position
+
+        if self._index is None:
+            self._index = faiss.IndexFlatIP(len(vector))
+            self._index.add(np.vstack(self._vectors))
+
+        scores, positions = self._index.search(vector.reshape(1, -1), 1)
+        return float(scores[0][0]), int(positions[0][0])
+
+
+# Cachés por agente, para no mezclar respuestas entre prompts distintos
+_caches: Dict[str, SemanticCache] = {}
+
+
+def get_semantic_cache(namespace: str) -> Optional[SemanticCache]:
+    """Obtiene la caché semántica de un agente, si está habilitada.
+
+    Args:
+        namespace: Identificador del agente o prompt que usa la caché
+
+    Returns:
+        Instancia de SemanticCache, o None si la caché está deshabilitada
+    """
+    if not settings["cache"]["semantic"]:
+        return None
+
+    if namespace not in _caches:
+        _caches[namespace] = SemanticCache(
+            threshold=settings["cache"]["semantic_threshold"],
+            max_size=settings["cache"]["max_size"],
+        )
+    return _caches[namespace]
@@ -0,0 +1,168 @@
+"""Ruteo semántico local para el supervisor.
+
+Compara el embedding del mensaje del usuario con el centroide de un conjunto de
+frases de ejemplo por agente. Si la similitud supera el umbral, el supervisor
+puede rutear sin llamar al LLM; en los casos ambiguos se devuelve None y la
+decisión queda en manos del modelo. Usa el mismo modelo de embeddings opcional
+que la caché semántica, así que sin `sentence-transformers` el ruteo se desactiva.
+"""
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Callable, List, Mapping, Optional, Tuple
+
+from src.config.settings import get_settings
+from src.services.semantic_cache import Embedding, embed_text
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy llega con sentence-transformers
+    np = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Frases de ejemplo por agente. El agente legal no se incluye: sin consentimiento
+# el supervisor siempre pasa por él y con consentimiento no hace falta volver
+ROUTE_EXEMPLARS: Mapping[str, Tuple[str, ...]] = {
+    "collector": (
+        "me llamo Juan Pérez",
+        "mi nombre es María",
+        "soy Carlos Rodríguez",
+        "mi número es 987654321",
+        "mi celular es 912345678",
+        "puedes llamarme al 999888777",
+        "mi correo es juan@gmail.com",
+        "escríbeme a maria.lopez@hotmail.com",
+        "mi email es carlos@empresa.pe",
+        "te dejo mi teléfono",
+        "te paso mis datos de contacto",
+        "contáctame por whatsapp",
+    ),
+    "location": (
+        "en Miraflores",
+        "busco algo en San Isidro",
+        "me interesa Surco o La Molina",
+        "quiero vivir en Barranco",
+        "¿qué tal es Jesús María para vivir?",
+        "prefiero Lima Moderna",
+        "algo cerca del trabajo en San Borja",
+        "¿qué distritos me recomiendas?",
+        "una zona segura y tranquila",
+        "en qué zona me conviene comprar",
+        "me gusta la zona de Lima Norte",
+        "cerca de la playa en el sur",
+    ),
+    "preferences": (
+        "mi presupuesto es 200000",
+        "tengo hasta 150 mil dólares",
+        "busco un departamento de 3 habitaciones",
+        "quiero una casa con jardín",
+        "necesito unos 90 metros cuadrados",
+        "un depa de dos dormitorios",
+        "entre 300 mil y 400 mil soles",
+        "busco una oficina",
+        "quiero comprar en los próximos 3 meses",
+        "con cochera y ascensor",
+        "un terreno para construir",
+        "máximo 120 mil",
+    ),
+}
+
+
+class SemanticRouter:
+    """Clasificador de mensajes por similitud coseno con los centroides de cada agente."""
+
+    def __init__(
+        self,
+        threshold: float = 0.62,
+        exemplars: Optional[Mapping[str, Tuple[str, ...]]] = None,
+        embed_fn: Optional[Callable[[str], Optional[Embedding]]] = None,
+    ):
+        """Inicializa el ruteador semántico.
+
+        Args:
+            threshold: Similitud coseno mínima para aceptar una ruta
+            exemplars: Frases de ejemplo por agente
+            embed_fn: Función que devuelve el embedding normalizado de un texto
+        """
+        self.threshold = threshold
+        self.exemplars = exemplars or ROUTE_EXEMPLARS
+        self._embed = embed_fn or embed_text
+        self._labels: Tuple[str, ...] = ()
+        self._centroids: Optional[NDArray[np.float32]] = None
+        self._available = True
+
+    def route(self, text: str) -> Optional[str]:
+        """Obtiene el agente para un mensaje si la ruta es evidente.
+
+        Args:
+            text: Mensaje del usuario
+
+        Returns:
+            Nombre del agente, o None si ninguna ruta supera el umbral
+        """
+        if not self._load_centroids() or self._centroids is None:
+            return None
+
+        vector = self._embed(text)
+        if vector is None:
+            return None
+
+        similarities = self._centroids @ vector
+        position = int(similarities.argmax())
+        if float(similarities[position]) >= self.threshold:
+            return self._labels[position]
+        return None
+
+    async def aroute(self, text: str) -> Optional[str]:
+        """Versión asíncrona de `route`: los embeddings se calculan fuera del event loop."""
+        return await asyncio.to_thread(self.route, text)
+
+    def _load_centroids(self) -> bool:
+        """Calcula los centroides normalizados la primera vez que se necesitan."""
+        if self._centroids is not None:
+            return True
+        if not self._available or np is None:
+            return False
+
+        labels: List[str] = []
+        centroids: List[Embedding] = []
+        for label, phrases in self.exemplars.items():
+            embeddings = [self._embed(phrase) for phrase in phrases]
+            vectors = [vector for vector in embeddings if vector is not None]
+            if not vectors or len(vectors) < len(embeddings):
+                logger.warning("Ruteo semántico desactivado: no hay embeddings disponibles")
+                self._available = False
+                return False
+            centroid = np.mean(np.vstack(vectors), axis=0, dtype=np.float32)
+            labels.append(label)
+            centroids.append(centroid / np.linalg.norm(centroid))
+
+        self._labels = tuple(labels)
+        self._centroids = np.vstack(centroids).astype("float32")
+        return True
+
+
+# Ruteador compartido, creado la primera vez que se necesita
+_router: Optional[SemanticRouter] = None
+
+
+def get_semantic_router() -> Optional[SemanticRouter]:
+    """Obtiene el ruteador semántico compartido, si está habilitado.
+
+    Returns:
+        Instancia de SemanticRouter, o None si el ruteo semántico está deshabilitado
+    """
+    global _router
+
+    if not settings["routing"]["semantic"]:
+        return None
+
+    if _router is None:
+        _router = SemanticRouter(threshold=settings["routing"]["semantic_threshold"])
+    return _router
@@ -0,0 +1,2 @@
+# tests/unit_tests/agents/__init__.py
+"""Tests unitarios para los agentes."""
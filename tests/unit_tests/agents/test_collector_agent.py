@@ -0,0 +1,100 @@
+"""Pruebas del agente recolector de datos de contacto."""
+
+import asyncio
+
+import pytest
+
+from src.agents.collector_agent import TEMPLATE_ACKS, CollectorAgent
+
+
+@pytest.fixture
+def agent(monkeypatch) -> CollectorAgent:
+    """Agente recolector con la respuesta del modelo simulada."""
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    agent = CollectorAgent(model_name="claude-3-5-haiku-20241022")
+
+    async def fake_generate_response(user_message, lead_data):
+        return "respuesta del modelo"
+
+    monkeypatch.setattr(agent, "_generate_response", fake_generate_response)
+    return agent
+
+
+def _process(agent: CollectorAgent, message: str, messages: list) -> str:
+    state = {
+        "current_message": message,
+        "lead_data": {"nombre": "Ana"},
+        "messages": messages,
+        "lead_obj": None,
+    }
+    command = asyncio.run(agent.process_node(state, {"configurable": {}}))
+    return command.update["last_agent_response"]
+
+
+class TestCollectorAcks:
+    """Confirmaciones de datos con plantilla o con el modelo."""
+
+    def test_data_only_message_uses_template(self, agent: CollectorAgent) -> None:
+        """Un mensaje que solo trae datos se confirma con una plantilla."""
+        response = _process(agent, "mi celular es 987654321", [])
+        assert response == TEMPLATE_ACKS[0].format(nombre="Ana")
+
+    def test_template_is_deterministic(self, agent: CollectorAgent) -> None:
+        """La plantilla depende solo del historial, no del azar."""
+        first = _process(agent, "987654321", [{}, {}])
+        second = _process(agent, "987654321", [{}, {}])
+        assert first == second == TEMPLATE_ACKS[2].format(nombre="Ana")
+
+    @pytest.mark.parametrize(
+        "message",
+        [
+            "987654321, ¿cuándo me llaman?",
+            "mi celular es 987654321 y cuánto cuesta el depa",
+            "987654321 me pueden llamar en la tarde?",
+        ],
+    )
+    def test_question_is_answered_by_model(self, agent: CollectorAgent, message: str) -> None:
+        """Si el mensaje trae una pregunta, responde el modelo."""
+        assert _process(agent, message, []) == "respuesta del modelo"
+
+
+class TestCollectorCache:
+    """Uso de las cachés de respuestas según los datos personales."""
+
+    @pytest.fixture
+    def calls(self, monkeypatch) -> list:
+        """Registra los argumentos de cada llamada cacheada al modelo."""
+        calls: list = []
+
+        async def fake_ainvoke_cached(runnable, model_input, **kwargs):
+            calls.append(kwargs)
+            return "respuesta"
+
+        monkeypatch.setattr("src.agents.collector_agent.ainvoke_cached", fake_ainvoke_cached)
+        return calls
+
+    @pytest.mark.parametrize(
+        ("message", "lead_data"),
+        [
+            ("me llamo Ana", {}),
+            ("mi celular es 987654321", {}),
+            ("¿para qué lo necesitan?", {"nombre": "Ana"}),
+        ],
+    )
+    def test_personal_data_skips_caches(self, monkeypatch, calls, message, lead_data) -> None:
+        """Los turnos con datos personales no usan ninguna caché."""
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        agent = CollectorAgent(model_name="claude-3-5-haiku-20241022")
+        asyncio.run(agent._generate_response(message, lead_data))
+
+        assert calls[0]["key_parts"] is None
+        assert calls[0]["semantic_text"] is None
+
+    def test_message_without_data_uses_caches(self, monkeypatch, calls) -> None:
+        """Los mensajes sin datos personales usan ambas cachés."""
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        agent = CollectorAgent(model_name="claude-3-5-haiku-20241022")
+        asyncio.run(agent._generate_response("¿para qué necesitan mis datos?", {}))
+
+        assert calls[0]["key_parts"] is not None
+        assert calls[0]["semantic_text"] is not None
@@ -0,0 +1,80 @@
+"""Pruebas de la extracción local de datos de contacto."""
+
+import pytest
+
+from src.agents.collector_extraction import extract_contact_data, is_question
+
+
+@pytest.mark.parametrize(
+    ("message", "name"),
+    [
+        ("me llamo José Núñez", "José Núñez"),
+        ("Me llamo Ana", "Ana"),
+        ("Soy María", "María"),
+        ("hola, soy Íñigo", "Íñigo"),
+        ("Mi nombre es Ángela Muñoz Ávila", "Ángela Muñoz Ávila"),
+        ("Juan Pérez es mi nombre", "Juan Pérez"),
+        ("me llamo juan", "Juan"),
+        ("mi nombre es josé y busco casa", "José"),
+        ("Soy Ana, mi correo es ana@mail.com", "Ana"),
+    ],
+)
+def test_extracts_names(message: str, name: str) -> None:
+    """Extrae el nombre de las presentaciones habituales."""
+    assert extract_contact_data(message)["nombre"] == name
+
+
+@pytest.mark.parametrize(
+    "message",
+    ["soy de Lima", "soy maría", "soy ingeniero", "casi soy feliz", "busco casa en Surco"],
+)
+def test_ignores_ambiguous_names(message: str) -> None:
+    """No toma como nombre las frases que no lo son."""
+    assert "nombre" not in extract_contact_data(message)
+
+
+@pytest.mark.parametrize(
+    ("message", "phone"),
+    [
+        ("mi celular es 987654321", "987654321"),
+        ("llámame al 987 654 321", "987654321"),
+        ("51987654321", "51987654321"),
+        ("+51 987 654 321", "+51987654321"),
+        ("+51987654321, gracias", "+51987654321"),
+    ],
+)
+def test_extracts_valid_phone_numbers(message: str, phone: str) -> None:
+    """Extrae celulares peruanos con o sin prefijo y espacios."""
+    assert extract_contact_data(message)["celular"] == phone
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "9876543210",  # 10 dígitos
+        "98765432101",  # 11 dígitos
+        "519876543",  # 9 dígitos con prefijo 51, no es un celular
+        "51887654321",  # con prefijo, pero no empieza con 9
+        "12987654321",  # celular dentro de un número más largo
+        "987654321000",
+        "mi DNI es 45678912",
+    ],
+)
+def test_rejects_invalid_phone_numbers(message: str) -> None:
+    """Descarta números que no son celulares válidos."""
+    assert "celular" not in extract_contact_data(message)
+
+
+@pytest.mark.parametrize(
+    ("message", "expected"),
+    [
+        ("987654321", False),
+        ("mi correo es ana@mail.com", False),
+        ("¿cuándo me llaman?", True),
+        ("cuánto cuesta", True),
+        ("me pueden llamar en la tarde?", True),
+    ],
+)
+def test_is_question(message: str, expected: bool) -> None:
+    """Detecta si el mensaje contiene una pregunta."""
+    assert is_question(message) is expected
@@ -0,0 +1,132 @@
+"""Pruebas del agente legal y la detección del consentimiento."""
+
+import asyncio
+
+import pytest
+
+from src.agents.legal_agent import CONSENT_ACK, LegalAgent, grants_consent
+
+
+@pytest.fixture
+def agent(monkeypatch) -> LegalAgent:
+    """Agente legal con una clave de API de prueba."""
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    return LegalAgent(model_name="claude-3-5-haiku-20241022")
+
+
+def _turn(agent: LegalAgent, state: dict, message: str) -> dict:
+    """Ejecuta un turno del agente legal sobre el estado de una sesión."""
+    state["messages"].append({"role": "user", "content": message})
+    command = asyncio.run(
+        agent.process_node({**state, "current_message": message}, {"configurable": {}})
+    )
+    state["lead_data"] = {**state["lead_data"], **command.update["lead_data"]}
+    state["messages"].extend(command.update["messages"])
+    return command.update
+
+
+class TestLegalAgentSessions:
+    """Aislamiento de los datos y el historial entre sesiones."""
+
+    def test_consent_is_recorded_per_session(self, agent: LegalAgent) -> None:
+        """El consentimiento se guarda en los datos de cada sesión."""
+        session_a = {"lead_data": {}, "messages": [], "lead_obj": None}
+        session_b = {"lead_data": {}, "messages": [], "lead_obj": None}
+
+        update = _turn(agent, session_a, "acepto")
+        assert update["last_agent_response"] == CONSENT_ACK
+        assert session_a["lead_data"]["consentimiento"] is True
+
+        # El consentimiento de la sesión A no afecta a la sesión B
+        assert "consentimiento" not in session_b["lead_data"]
+        update = _turn(agent, session_b, "sí, autorizo")
+        assert update["last_agent_response"] == CONSENT_ACK
+        assert session_b["lead_data"]["consentimiento"] is True
+
+    def test_input_lead_data_is_not_modified(self, agent: LegalAgent) -> None:
+        """Los datos del lead recibidos no se modifican."""
+        lead_data: dict = {}
+        _, updated = asyncio.run(agent.aprocess_message("acepto", lead_data))
+
+        assert updated["consentimiento"] is True
+        assert lead_data == {}
+
+    def test_history_comes_from_session_state(self, agent: LegalAgent, monkeypatch) -> None:
+        """El historial del prompt sale de los mensajes de la sesión."""
+        prompts = []
+
+        async def fake_ainvoke_cached(model, model_input, **kwargs):
+            prompts.append("\n".join(str(message.content) for message in model_input))
+            return "respuesta"
+
+        monkeypatch.setattr("src.agents.legal_agent.ainvoke_cached", fake_ainvoke_cached)
+        session_a = {"lead_data": {}, "messages": [], "lead_obj": None}
+        session_b = {"lead_data": {}, "messages": [], "lead_obj": None}
+
+        _turn(agent, session_a, "Soy Ana, ¿para qué usan mis datos?")
+        _turn(agent, session_b, "¿qué es la ley 29733?")
+
+        assert "Soy Ana" not in prompts[-1]
+        # El mensaje actual va como entrada y no se repite en el historial
+        assert prompts[-1].count("¿qué es la ley 29733?") == 1
+
+    def test_cache_key_depends_on_conversation(self, agent: LegalAgent, monkeypatch) -> None:
+        """La clave de caché incluye el historial de la conversación."""
+        calls = []
+
+        async def fake_ainvoke_cached(model, model_input, **kwargs):
+            calls.append(kwargs)
+            return "respuesta"
+
+        monkeypatch.setattr("src.agents.legal_agent.ainvoke_cached", fake_ainvoke_cached)
+        session_a = {"lead_data": {"consentimiento": True}, "messages": [], "lead_obj": None}
+        session_b = {"lead_data": {"consentimiento": True}, "messages": [], "lead_obj": None}
+
+        _turn(agent, session_a, "ok")
+        _turn(agent, session_b, "¿qué derechos tengo?")
+        _turn(agent, session_b, "ok")
+
+        # El mismo "ok" en otro punto de la conversación no reutiliza la respuesta
+        assert calls[0]["key_parts"] != calls[2]["key_parts"]
+        assert calls[0]["semantic_text"] == "ok"
+        assert calls[2]["semantic_text"] is None
+
+
+@pytest.mark.parametrize(
+    "message",
+    ["sí", "Sí, acepto!", "ok", "claro que sí", "autorizo el uso de mis datos", "estoy de acuerdo"],
+)
+def test_grants_consent_accepts_affirmative_messages(message: str) -> None:
+    """Reconoce las respuestas afirmativas como consentimiento."""
+    assert grants_consent(message)
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "no acepto",
+        "No autorizo",
+        "no estoy de acuerdo",
+        "no lo autorizo",
+        "no, no acepto",
+        "nunca lo acepto",
+        "si no quiero",
+        "casi",
+        "¿para qué usan mis datos?",
+    ],
+)
+def test_grants_consent_rejects_negated_messages(message: str) -> None:
+    """No toma como consentimiento las frases negadas."""
+    assert not grants_consent(message)
+
+
+def test_negated_consent_is_not_recorded(agent: LegalAgent, monkeypatch) -> None:
+    """Un rechazo no registra el consentimiento."""
+
+    async def fake_ainvoke_cached(model, model_input, **kwargs):
+        return "Entendido, no usaremos tus datos."
+
+    monkeypatch.setattr("src.agents.legal_agent.ainvoke_cached", fake_ainvoke_cached)
+    _, updated = asyncio.run(agent.aprocess_message("no estoy de acuerdo", {}))
+
+    assert "consentimiento" not in updated
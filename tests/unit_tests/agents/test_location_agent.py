@@ -0,0 +1,94 @@
+"""Pruebas del agente de ubicación y la extracción local de distritos."""
+
+import asyncio
+
+import pytest
+
+from src.agents.location_agent import LocationAgent, extract_location
+
+
+@pytest.mark.parametrize(
+    ("message", "expected"),
+    [
+        ("busco en Miraflores", {"distrito": "Miraflores"}),
+        ("San Juan de Miraflores", {"distrito": "San Juan de Miraflores"}),
+        ("busco en san juan de miraflores", {"distrito": "San Juan de Miraflores"}),
+        ("San Juan de Lurigancho", {"distrito": "San Juan de Lurigancho"}),
+        ("en Jesus Maria o Lince", {"distrito": "Jesús María"}),
+        ("algo en BREÑA", {"distrito": "Breña"}),
+        ("algo en lima norte, de preferencia Comas", {"zona": "lima norte", "distrito": "Comas"}),
+        ("en Lima Moderna", {"zona": "lima moderna"}),
+        ("todavía no sé dónde", {}),
+    ],
+)
+def test_extracts_first_district_and_zone(message: str, expected: dict) -> None:
+    """Extrae el primer distrito y la zona mencionados."""
+    assert extract_location(message) == expected
+
+
+@pytest.mark.parametrize(
+    "message", ["tengo patente de conducir", "la atención fue buena", "los surcos del jardín"]
+)
+def test_ignores_names_inside_other_words(message: str) -> None:
+    """No detecta distritos dentro de otras palabras."""
+    assert extract_location(message) == {}
+
+
+@pytest.mark.parametrize(
+    ("message", "district"),
+    [("en Ate", "Ate"), ("ate, por favor", "Ate"), ("Comas.", "Comas")],
+)
+def test_matches_short_names_as_whole_words(message: str, district: str) -> None:
+    """Los nombres cortos se reconocen como palabras completas."""
+    assert extract_location(message) == {"distrito": district}
+
+
+def test_history_comes_from_session_state(monkeypatch) -> None:
+    """El historial del prompt sale de los mensajes de la sesión."""
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    agent = LocationAgent(model_name="claude-3-5-haiku-20241022")
+    prompts = []
+
+    async def fake_ainvoke_cached(model, model_input, **kwargs):
+        prompts.append("\n".join(str(message.content) for message in model_input))
+        return "respuesta"
+
+    monkeypatch.setattr("src.agents.location_agent.ainvoke_cached", fake_ainvoke_cached)
+
+    for message in ("Soy Ana y vivo cerca del Óvalo Gutiérrez", "busco en Surco"):
+        state = {
+            "current_message": message,
+            "lead_data": {},
+            "messages": [{"role": "user", "content": message}],
+            "lead_obj": None,
+        }
+        asyncio.run(agent.process_node(state, {"configurable": {}}))
+
+    # La misma instancia atiende ambas sesiones sin mezclar sus historiales
+    assert "Óvalo Gutiérrez" not in prompts[-1]
+
+
+def test_cache_key_depends_on_conversation(monkeypatch) -> None:
+    """La clave de caché incluye el historial de la conversación."""
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    agent = LocationAgent(model_name="claude-3-5-haiku-20241022")
+    calls = []
+
+    async def fake_ainvoke_cached(model, model_input, **kwargs):
+        calls.append(kwargs)
+        return "respuesta"
+
+    monkeypatch.setattr("src.agents.location_agent.ainvoke_cached", fake_ainvoke_cached)
+
+    asyncio.run(agent.aprocess_message("sí", {}, [{"role": "user", "content": "sí"}]))
+    history = [
+        {"role": "user", "content": "¿Surco es seguro?"},
+        {"role": "assistant", "content": "Sí. ¿Te interesa Surco?"},
+        {"role": "user", "content": "sí"},
+    ]
+    asyncio.run(agent.aprocess_message("sí", {}, history))
+
+    # El mismo "sí" en otro punto de la conversación no reutiliza la respuesta
+    assert calls[0]["key_parts"] != calls[1]["key_parts"]
+    assert calls[0]["semantic_text"] is not None
+    assert calls[1]["semantic_text"] is None
@@ -0,0 +1,71 @@
+"""Pruebas del agente de preferencias inmobiliarias."""
+
+import asyncio
+
+import pytest
+
+from src.agents.preferences_agent import PreferencesAgent, PropertyPreference
+
+
+@pytest.fixture
+def agent(monkeypatch) -> PreferencesAgent:
+    """Agente de preferencias con una clave de API de prueba."""
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    return PreferencesAgent(model_name="claude-3-5-haiku-20241022")
+
+
+class TestPreferencesExtraction:
+    """Combinación de la extracción local con la de la herramienta."""
+
+    def test_tool_fields_are_merged_with_local_extraction(self, agent, monkeypatch) -> None:
+        """Los campos de la herramienta completan los del extractor local."""
+
+        async def fake_extraction(user_input, user_data, chat_history, first_turn):
+            return "¿Cuántas habitaciones necesitas?", PropertyPreference(
+                tipo_inmueble="departamento",
+                presupuesto_max=1.0,
+                distrito="Miraflores",
+                metraje=90,
+            )
+
+        monkeypatch.setattr(agent, "_generate_response_with_extraction", fake_extraction)
+
+        lead_data: dict = {"consentimiento": True}
+        response, data = asyncio.run(
+            agent.aprocess_message(
+                "busco un departamento de 200 mil dólares, unos noventa metros en Miraflores",
+                lead_data,
+            )
+        )
+
+        assert response == "¿Cuántas habitaciones necesitas?"
+        # Campos que el extractor local no reconoce llegan desde la herramienta
+        assert data["distrito"] == "Miraflores"
+        assert data["metraje"] == 90
+        # Si ambos extraen el mismo campo, prevalece el extractor local
+        assert data["presupuesto_max"] == 200000.0
+        assert data["tipo_inmueble"] == "departamento"
+        # Los datos del estado, compartidos con otros agentes, no se modifican
+        assert lead_data == {"consentimiento": True}
+
+
+def test_batch_keeps_order_and_bounds_concurrency(agent, monkeypatch) -> None:
+    """Los mensajes se procesan en paralelo con un límite y en el orden de entrada."""
+    active = peak = 0
+
+    async def fake_process(user_input, user_data, history=()):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0)
+        active -= 1
+        return f"respuesta a {user_input}", {**user_data, "mensaje": user_input}
+
+    monkeypatch.setattr(agent, "aprocess_message", fake_process)
+    turns = [(f"mensaje {i}", {"id": i}) for i in range(5)]
+
+    results = asyncio.run(agent.aprocess_batch(turns, max_concurrency=2))
+
+    assert peak == 2
+    assert [data["id"] for _, data in results] == list(range(5))
+    assert results[3][0] == "respuesta a mensaje 3"
@@ -0,0 +1,71 @@
+"""Pruebas de la extracción local de preferencias inmobiliarias."""
+
+import pytest
+
+from src.agents.preferences_extraction import extract_preferences
+
+
+@pytest.mark.parametrize(
+    ("message", "budget", "currency"),
+    [
+        ("hasta $ 150,000", 150000.0, "dólares"),
+        ("US$200.000", 200000.0, "dólares"),
+        ("150000 usd", 150000.0, "dólares"),
+        ("S/ 2500 al mes", 2500.0, "soles"),
+        ("s/. 450,000", 450000.0, "soles"),
+        ("300 mil soles", 300000.0, "soles"),
+        ("unos 120 mil dólares", 120000.0, "dólares"),
+    ],
+)
+def test_extracts_budget_and_currency(message: str, budget: float, currency: str) -> None:
+    """Extrae el presupuesto máximo y su moneda."""
+    extracted = extract_preferences(message)
+    assert extracted["presupuesto_max"] == budget
+    assert extracted["moneda"] == currency
+    assert "presupuesto_min" not in extracted
+
+
+def test_extracts_budget_range() -> None:
+    """Extrae el presupuesto mínimo y máximo de un rango."""
+    extracted = extract_preferences("entre $100,000 y $150,000")
+    assert extracted["presupuesto_min"] == 100000.0
+    assert extracted["presupuesto_max"] == 150000.0
+    assert extracted["moneda"] == "dólares"
+
+
+@pytest.mark.parametrize(
+    "message", ["tengo 3 hijos y 2 perros", "vivo en el piso 12", "ok, gracias"]
+)
+def test_numbers_without_currency_are_not_budget(message: str) -> None:
+    """Los números sin moneda no se toman como presupuesto."""
+    assert "presupuesto_max" not in extract_preferences(message)
+
+
+@pytest.mark.parametrize(
+    ("message", "property_type"),
+    [
+        ("busco una casa de playa", "casa de playa"),
+        ("una casa en la playa", "casa de playa"),
+        ("un depa en Surco", "departamento"),
+        ("departamentos de 2 dormitorios", "departamento"),
+        ("un flat", "departamento"),
+        ("quiero una casa", "casa"),
+        ("un chalet con jardín", "casa"),
+        ("terreno de 200 m2", "terreno"),
+        ("un lote", "terreno"),
+        ("una oficina", "oficina"),
+        ("local comercial", "oficina"),
+        ("Busco CASA", "casa"),
+    ],
+)
+def test_extracts_property_type(message: str, property_type: str) -> None:
+    """Normaliza el tipo de inmueble y sus sinónimos."""
+    assert extract_preferences(message)["tipo_inmueble"] == property_type
+
+
+@pytest.mark.parametrize(
+    "message", ["mi casamiento es en marzo", "necesito un depósito", "soy localista", "hola"]
+)
+def test_property_type_requires_whole_words(message: str) -> None:
+    """El tipo de inmueble solo se reconoce como palabra completa."""
+    assert "tipo_inmueble" not in extract_preferences(message)
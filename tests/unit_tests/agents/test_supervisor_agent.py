@@ -0,0 +1,97 @@
+"""Pruebas del supervisor que rutea los mensajes entre agentes."""
+
+import asyncio
+
+import pytest
+from langgraph.graph import END
+
+from src.agents.supervisor_agent import SupervisorAgent, carries_lead_data
+from src.models.lead_data import LeadData
+
+
+class TestCarriesLeadData:
+    """Detección de mensajes que pueden traer datos del lead."""
+
+    @pytest.mark.parametrize(
+        "message",
+        [
+            "me llamo Ana Torres",
+            "mi celular es 987654321",
+            "escríbeme a ana@gmail.com",
+            "tengo hasta 200 mil dólares",
+            "busco un departamento",
+            "algo en Miraflores",
+            "de 3 habitaciones",
+        ],
+    )
+    def test_messages_with_data(self, message: str) -> None:
+        """Los mensajes con datos del lead se detectan."""
+        assert carries_lead_data(message)
+
+    @pytest.mark.parametrize("message", ["sí", "ok, dale", "hola, ¿qué tal?", "gracias"])
+    def test_messages_without_data(self, message: str) -> None:
+        """Las respuestas breves sin datos no se marcan."""
+        assert not carries_lead_data(message)
+
+
+class TestDecisionFallback:
+    """Ruteo de respaldo cuando falla la decisión del modelo."""
+
+    @pytest.fixture
+    def agent(self, monkeypatch) -> SupervisorAgent:
+        """Supervisor cuya decisión con el modelo siempre falla."""
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        agent = SupervisorAgent(model_name="claude-3-5-haiku-20241022")
+        agent.semantic_router = None
+
+        async def failing_decide(*args, **kwargs):
+            raise ValueError("decisión inválida")
+
+        monkeypatch.setattr(agent, "_decide", failing_decide)
+        return agent
+
+    def test_fallback_ends_turn_once_answered(self, agent: SupervisorAgent) -> None:
+        """Si ya hubo respuesta al mensaje, el turno termina."""
+        state = {
+            "current_message": "quiero saber más",
+            "lead_data": {"consentimiento": True},
+            "messages": [
+                {"role": "user", "content": "quiero saber más"},
+                {"role": "assistant", "content": "Claro, te explico.", "agent": "legal"},
+            ],
+            "next": "legal",
+            "lead_obj": None,
+        }
+        command = asyncio.run(agent.router_node(state, {"configurable": {}}))
+
+        # El agente que ya respondió no vuelve a recibir el mismo mensaje
+        assert command.goto == END
+
+    def test_fallback_routes_unanswered_message(self, agent: SupervisorAgent) -> None:
+        """Un mensaje sin respuesta se envía al agente que corresponda."""
+        state = {
+            "current_message": "hola",
+            "lead_data": {"consentimiento": True},
+            "messages": [{"role": "user", "content": "hola"}],
+            "next": "legal",
+            "lead_obj": None,
+        }
+        command = asyncio.run(agent.router_node(state, {"configurable": {}}))
+
+        assert command.goto == "collector"
+
+    def test_state_lead_obj_is_not_mutated(self, agent: SupervisorAgent) -> None:
+        """El supervisor sincroniza una copia del lead, no el objeto del estado."""
+        lead_obj = LeadData(consentimiento=True)
+        state = {
+            "current_message": "hola",
+            "lead_data": {"consentimiento": True, "nombre": "Ana"},
+            "messages": [{"role": "user", "content": "hola"}],
+            "lead_obj": lead_obj,
+        }
+        command = asyncio.run(agent.router_node(state, {"configurable": {}}))
+
+        assert command.update["lead_obj"] is not lead_obj
+        assert command.update["lead_obj"].nombre == "Ana"
+        assert lead_obj.nombre is None
+        assert lead_obj.metadata.ultima_interaccion is None
@@ -1,8 +1,18 @@
+import operator
 from datetime import datetime
+from typing import get_type_hints
 
 import pytest
 
-from src.models.agent_state import AgentState, Message, get_initial_state
+from src.models.agent_state import (
+    MAX_MESSAGES,
+    AgentState,
+    Message,
+    append_messages,
+    get_initial_state,
+    lead_data_changes,
+    merge_lead_data,
+)
 
 
 class TestAgentState:
@@ -51,3 +61,58 @@ class TestAgentState:
 
         # User ID should default to session ID
         assert state["user_id"] == session_id
+
+    def test_messages_reducer_appends(self) -> None:
+        """El reducer de messages añade los mensajes nuevos al historial."""
+        hints = get_type_hints(AgentState, include_extras=True)
+        reducer = hints["messages"].__metadata__[0]
+
+        user_message = {"role": "user", "content": "Hola"}
+        assistant_message = {"role": "assistant", "content": "¡Hola!"}
+
+        assert reducer is append_messages
+        assert reducer([user_message], [assistant_message]) == [user_message, assistant_message]
+
+    def test_messages_reducer_does_not_modify_history(self) -> None:
+        """El historial anterior no cambia: lo comparten instantáneas y resultados."""
+        history = [{"role": "user", "content": "Hola"}]
+
+        merged = append_messages(history, [{"role": "assistant", "content": "¡Hola!"}])
+
+        assert merged is not history
+        assert len(merged) == 2
+        assert len(history) == 1
+
+    def test_messages_reducer_is_bounded(self) -> None:
+        """Al superar MAX_MESSAGES se descartan los mensajes más antiguos."""
+        history = [{"role": "user", "content": str(i)} for i in range(MAX_MESSAGES)]
+        new_message = {"role": "assistant", "content": "último"}
+
+        merged = append_messages(history, [new_message])
+
+        assert len(merged) == MAX_MESSAGES
+        assert merged[0]["content"] == "1"
+        assert merged[-1] is new_message
+
+    def test_routing_decisions_reducer_appends(self) -> None:
+        """El reducer de routing_decisions concatena las decisiones."""
+        hints = get_type_hints(AgentState, include_extras=True)
+        reducer = hints["routing_decisions"].__metadata__[0]
+
+        assert reducer is operator.add
+        assert reducer([{"next_agent": "legal"}], [{"next_agent": "collector"}]) == [
+            {"next_agent": "legal"},
+            {"next_agent": "collector"},
+        ]
+
+    def test_parallel_lead_data_changes_do_not_overwrite_each_other(self) -> None:
+        """Las ramas paralelas devuelven solo sus cambios y el reducer los combina."""
+        current = {"consentimiento": True, "nombre": None}
+        collector = lead_data_changes(current, {**current, "nombre": "Ana"})
+        location = lead_data_changes(current, {**current, "distrito": "Surco"})
+
+        assert collector == {"nombre": "Ana"}
+        assert location == {"distrito": "Surco"}
+        for first, second in ((collector, location), (location, collector)):
+            merged = merge_lead_data(merge_lead_data(current, first), second)
+            assert merged == {"consentimiento": True, "nombre": "Ana", "distrito": "Surco"}
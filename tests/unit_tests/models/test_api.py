@@ -37,6 +37,15 @@ class TestChatRequest:
         assert request.user_id == "user-456"
         assert request.metadata == {"source": "web", "path": "/contacto"}
 
+    def test_unknown_fields_and_immutability(self) -> None:
+        """Rechaza campos desconocidos y no permite modificar la solicitud."""
+        with pytest.raises(Exception):
+            ChatRequest(message="Hola", canal="web")
+
+        request = ChatRequest(message="Hola")
+        with pytest.raises(Exception):
+            request.message = "Adiós"
+
 
 class TestLeadDataResponse:
     def test_extended_fields(self) -> None:
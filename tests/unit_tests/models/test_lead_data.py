@@ -171,3 +171,39 @@ class TestLeadData:
         assert lead.consentimiento is True
         assert lead.celular == "987654321"
         assert not hasattr(lead, "no_existe")
+
+    def test_update_from_dict_without_validation(self) -> None:
+        """Sin validación se ignoran los None y los campos desconocidos, y el rango se ordena."""
+        lead = LeadData.model_construct(nombre="Maria López")
+        lead.update_from_dict(
+            {
+                "presupuesto_min": 200000.0,
+                "presupuesto_max": 100000.0,
+                "celular": None,  # Should be ignored
+                "no_existe": "valor",  # Should be ignored
+            },
+            validate=False,
+        )
+        assert lead.nombre == "Maria López"
+        assert lead.presupuesto_min == 100000.0
+        assert lead.presupuesto_max == 200000.0
+        assert lead.celular is None
+        assert not hasattr(lead, "no_existe")
+        assert lead.to_dict()["presupuesto_max"] == 200000.0
+
+    def test_to_dict_is_cached_until_changed(self) -> None:
+        """to_dict reutiliza el resultado hasta que el lead cambia."""
+        lead = LeadData(nombre="Juan Pérez")
+        first = lead.to_dict()
+        assert lead.to_dict() is first
+
+        lead.celular = "987654321"
+        assert lead.to_dict()["celular"] == "987654321"
+
+        cached = lead.to_dict()
+        lead.update_from_dict({"email": "juan@gmail.com"}, validate=False)
+        assert lead.to_dict() is not cached
+        assert lead.to_dict()["email"] == "juan@gmail.com"
+
+        lead.mark_interaction("2025-01-01T00:00:00+00:00")
+        assert lead.to_dict()["metadata"]["ultima_interaccion"] == "2025-01-01T00:00:00+00:00"
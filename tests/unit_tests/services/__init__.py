@@ -0,0 +1,2 @@
+# tests/unit_tests/services/__init__.py
+"""Tests unitarios para los servicios."""
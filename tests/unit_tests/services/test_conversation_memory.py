@@ -0,0 +1,66 @@
+"""Pruebas de la compactación y el formato del historial de la conversación."""
+
+import asyncio
+
+from src.services import conversation_memory
+from src.services.conversation_memory import (
+    HISTORY_COMPACT_THRESHOLD,
+    HISTORY_WINDOW,
+    compact_history,
+    format_history,
+)
+
+
+def _messages(count: int):
+    return [{"role": "user", "content": f"mensaje {i}"} for i in range(count)]
+
+
+class TestCompactHistory:
+    """Resumen de los mensajes antiguos al superar el umbral."""
+
+    def test_short_history_is_kept(self) -> None:
+        """Bajo el umbral el historial no se compacta."""
+        state = {"messages": _messages(HISTORY_COMPACT_THRESHOLD), "context": {}}
+        assert asyncio.run(compact_history(state)) is None
+
+    def test_old_messages_are_summarized(self, monkeypatch) -> None:
+        """Los mensajes antiguos se reemplazan por un resumen."""
+        summarized = []
+
+        async def fake_summarize(messages, previous_summary=""):
+            summarized.append((len(messages), previous_summary))
+            return "resumen nuevo"
+
+        monkeypatch.setattr(conversation_memory, "summarize_messages", fake_summarize)
+        messages = _messages(HISTORY_COMPACT_THRESHOLD + 1)
+        state = {"messages": messages, "context": {"summary": "resumen previo"}}
+
+        update = asyncio.run(compact_history(state))
+
+        assert update["messages"].value == messages[-HISTORY_WINDOW:]
+        assert update["context"] == {"summary": "resumen nuevo"}
+        assert summarized == [(len(messages) - HISTORY_WINDOW, "resumen previo")]
+        # El estado original no se modifica
+        assert state["context"] == {"summary": "resumen previo"}
+
+    def test_summary_error_keeps_history(self, monkeypatch) -> None:
+        """Si el resumen falla se conserva el historial completo."""
+
+        async def failing_summarize(messages, previous_summary=""):
+            raise RuntimeError("sin conexión")
+
+        monkeypatch.setattr(conversation_memory, "summarize_messages", failing_summarize)
+        state = {"messages": _messages(HISTORY_COMPACT_THRESHOLD + 1), "context": {}}
+        assert asyncio.run(compact_history(state)) is None
+
+
+def test_format_history_omits_current_message() -> None:
+    """El mensaje actual del usuario no se repite en el historial del prompt."""
+    messages = [
+        {"role": "user", "content": "hola"},
+        {"role": "assistant", "content": "¿En qué te ayudo?"},
+        {"role": "user", "content": "busco casa"},
+    ]
+
+    assert format_history(messages) == "Usuario: hola\n\nAsistente: ¿En qué te ayudo?\n\n"
+    assert format_history(messages[:1]) == ""
@@ -0,0 +1,52 @@
+"""Pruebas de la caché exacta de respuestas del LLM."""
+
+from src.services.llm_cache import LLMCache, is_cacheable, normalize_message
+
+
+class TestLLMCache:
+    """Claves, lectura, escritura y desalojo de la caché."""
+
+    def test_cache_key_is_deterministic(self) -> None:
+        """La misma entrada produce siempre la misma clave."""
+        key1 = LLMCache.cache_key("modelo", 0.0, "prompt", "hola")
+        key2 = LLMCache.cache_key("modelo", 0.0, "prompt", "hola")
+        assert key1 == key2
+        assert key1 != LLMCache.cache_key("modelo", 0.0, "prompt", "adiós")
+
+    def test_get_and_set(self) -> None:
+        """Guarda y recupera una respuesta."""
+        cache = LLMCache(max_size=2)
+        assert cache.get("a") is None
+
+        cache.set("a", "respuesta")
+        assert cache.get("a") == "respuesta"
+        assert len(cache) == 1
+
+    def test_evicts_least_recently_used(self) -> None:
+        """Al llenarse descarta la entrada menos usada."""
+        cache = LLMCache(max_size=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")  # "b" pasa a ser el menos usado
+        cache.set("c", "3")
+
+        assert cache.get("a") == "1"
+        assert cache.get("b") is None
+        assert cache.get("c") == "3"
+
+    def test_clear(self) -> None:
+        """Vacía todas las entradas."""
+        cache = LLMCache()
+        cache.set("a", "1")
+        cache.clear()
+        assert len(cache) == 0
+
+
+def test_is_cacheable_with_zero_temperature() -> None:
+    """Con temperatura cero las respuestas son cacheables."""
+    assert is_cacheable(0) is True
+
+
+def test_normalize_message_ignores_case_and_spacing() -> None:
+    """La normalización ignora mayúsculas y espacios."""
+    assert normalize_message("  Hola   Mundo ") == normalize_message("hola mundo")
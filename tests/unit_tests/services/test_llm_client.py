@@ -0,0 +1,51 @@
+"""Pruebas del límite de llamadas concurrentes a los proveedores de LLM."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from src.services import llm_client
+from src.services.llm_client import provider_slot
+
+
+class ChatAnthropic:
+    """Cliente falso; el proveedor se detecta por el nombre de la clase."""
+
+
+class ChatOpenAI:
+    """Cliente falso de otro proveedor."""
+
+
+class _Binding:
+    def __init__(self, bound) -> None:
+        self.bound = bound
+
+
+async def _peak_concurrency(models) -> int:
+    active = peak = 0
+
+    async def call(model) -> None:
+        nonlocal active, peak
+        async with provider_slot(model):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0)
+            active -= 1
+
+    await asyncio.gather(*(call(model) for model in models))
+    return peak
+
+
+def test_provider_slot_caps_concurrent_calls(monkeypatch) -> None:
+    """Las llamadas a un proveedor no superan el límite."""
+    monkeypatch.setattr(llm_client, "_MAX_CONCURRENT_REQUESTS", 2)
+    models = [ChatAnthropic(), _Binding(ChatAnthropic())] * 3
+    assert asyncio.run(_peak_concurrency(models)) == 2
+
+
+def test_provider_slot_limits_each_provider_separately(monkeypatch) -> None:
+    """Cada proveedor tiene su propio límite."""
+    monkeypatch.setattr(llm_client, "_MAX_CONCURRENT_REQUESTS", 1)
+    assert asyncio.run(_peak_concurrency([ChatAnthropic(), ChatOpenAI()])) == 2
@@ -0,0 +1,82 @@
+"""Pruebas de la caché semántica de respuestas."""
+
+import asyncio
+import threading
+
+import pytest
+
+from src.services.semantic_cache import SemanticCache, get_semantic_cache
+
+np = pytest.importorskip("numpy")
+
+# Embeddings fijos para no depender de un modelo real
+_VECTORS = {
+    "sí, acepto": [1.0, 0.0, 0.0],
+    "ok, acepto": [0.99, 0.14, 0.0],
+    "busco casa en Surco": [0.0, 1.0, 0.0],
+}
+
+
+def _fake_embed(text: str):
+    vector = np.array(_VECTORS[text], dtype="float32")
+    return vector / np.linalg.norm(vector)
+
+
+class TestSemanticCache:
+    """Búsqueda por similitud con embeddings fijos."""
+
+    def test_empty_cache_misses(self) -> None:
+        """Una caché vacía no devuelve respuestas."""
+        cache = SemanticCache(embed_fn=_fake_embed)
+        assert cache.lookup("sí, acepto") is None
+
+    def test_similar_text_hits(self) -> None:
+        """Un texto equivalente reutiliza la respuesta guardada."""
+        cache = SemanticCache(threshold=0.9, embed_fn=_fake_embed)
+        cache.add("sí, acepto", "¡Gracias por tu consentimiento!")
+
+        assert cache.lookup("ok, acepto") == "¡Gracias por tu consentimiento!"
+        assert cache.lookup("busco casa en Surco") is None
+
+    def test_max_size_discards_oldest(self) -> None:
+        """Al llenarse descarta la entrada más antigua."""
+        cache = SemanticCache(max_size=1, embed_fn=_fake_embed)
+        cache.add("sí, acepto", "primera")
+        cache.add("busco casa en Surco", "segunda")
+
+        assert len(cache) == 1
+        assert cache.lookup("busco casa en Surco") == "segunda"
+
+    def test_async_lookup_embeds_off_the_event_loop(self) -> None:
+        """Las versiones asíncronas calculan el embedding en otro hilo."""
+        cache = SemanticCache(threshold=0.9, embed_fn=_fake_embed)
+
+        async def run():
+            loop_thread = threading.get_ident()
+            embed_threads = []
+
+            def tracking_embed(text: str):
+                embed_threads.append(threading.get_ident())
+                return _fake_embed(text)
+
+            cache._embed = tracking_embed
+            await cache.aadd("sí, acepto", "¡Gracias!")
+            hit = await cache.alookup("ok, acepto")
+            return hit, loop_thread, embed_threads
+
+        hit, loop_thread, embed_threads = asyncio.run(run())
+
+        assert hit == "¡Gracias!"
+        assert len(embed_threads) == 2
+        assert loop_thread not in embed_threads
+
+    def test_embedder_unavailable(self) -> None:
+        """Sin modelo de embeddings no se guarda nada."""
+        cache = SemanticCache(embed_fn=lambda text: None)
+        cache.add("sí, acepto", "respuesta")
+        assert len(cache) == 0
+
+
+def test_semantic_cache_disabled_by_default() -> None:
+    """La caché semántica está desactivada por defecto."""
+    assert get_semantic_cache("collector") is None
@@ -0,0 +1,51 @@
+"""Pruebas del ruteo semántico local del supervisor."""
+
+import pytest
+
+from src.services.semantic_router import SemanticRouter
+
+np = pytest.importorskip("numpy")
+
+# Embeddings fijos para no depender de un modelo real
+_VECTORS = {
+    "mi correo es juan@gmail.com": [1.0, 0.0, 0.0],
+    "me llamo Juan": [0.9, 0.1, 0.0],
+    "en Miraflores": [0.0, 1.0, 0.0],
+    "busco algo en Surco": [0.1, 0.9, 0.0],
+    "mi nombre es Ana": [0.95, 0.05, 0.0],
+    "quiero vivir en Barranco": [0.05, 0.95, 0.0],
+    "hola, ¿qué tal?": [0.5, 0.5, 0.7],
+}
+
+_EXEMPLARS = {
+    "collector": ("mi correo es juan@gmail.com", "me llamo Juan"),
+    "location": ("en Miraflores", "busco algo en Surco"),
+}
+
+
+def _fake_embed(text: str):
+    vector = np.array(_VECTORS[text], dtype="float32")
+    return vector / np.linalg.norm(vector)
+
+
+class TestSemanticRouter:
+    """Ruteo por similitud con los centroides de cada agente."""
+
+    def test_routes_to_closest_agent(self) -> None:
+        """Rutea al agente con el centroide más cercano."""
+        router = SemanticRouter(threshold=0.9, exemplars=_EXEMPLARS, embed_fn=_fake_embed)
+
+        assert router.route("mi nombre es Ana") == "collector"
+        assert router.route("quiero vivir en Barranco") == "location"
+
+    def test_ambiguous_message_falls_back(self) -> None:
+        """Un mensaje ambiguo se deja al modelo."""
+        router = SemanticRouter(threshold=0.9, exemplars=_EXEMPLARS, embed_fn=_fake_embed)
+
+        assert router.route("hola, ¿qué tal?") is None
+
+    def test_embedder_unavailable(self) -> None:
+        """Sin modelo de embeddings el ruteo se desactiva."""
+        router = SemanticRouter(exemplars=_EXEMPLARS, embed_fn=lambda text: None)
+
+        assert router.route("en Miraflores") is None